@@ -2,7 +2,7 @@ from typing import Any
 
 from fastapi import APIRouter
 
-from app.api.api_v0.endpoints import auth, items, tests, users
+from app.api.api_v0.endpoints import auth, items, metrics, tests, users
 from app.schemas.response import ErrorResponse, ValidationErrorResponse
 
 api_router = APIRouter(
@@ -27,6 +27,10 @@ api_router.include_router(
             "model": ErrorResponse[str | dict[str, Any]],
             "description": "User not found",
         },
+        503: {
+            "model": ErrorResponse[str | dict[str, Any]],
+            "description": "Password hashing service is overloaded",
+        },
     },
 )
 api_router.include_router(
@@ -50,6 +54,10 @@ api_router.include_router(
             "model": ErrorResponse[str | dict[str, Any]],
             "description": "Username already exists",
         },
+        503: {
+            "model": ErrorResponse[str | dict[str, Any]],
+            "description": "Password hashing service is overloaded",
+        },
     },
 )
 api_router.include_router(
@@ -90,3 +98,18 @@ api_router.include_router(
         },
     },
 )
+api_router.include_router(
+    metrics.router,
+    prefix="/metrics",
+    tags=["metrics"],
+    responses={
+        401: {
+            "model": ErrorResponse[str | dict[str, Any]],
+            "description": "Could not validate credentials",
+        },
+        403: {
+            "model": ErrorResponse[str | dict[str, Any]],
+            "description": "Inactive user or the user doesn't have enough privileges",
+        },
+    },
+)
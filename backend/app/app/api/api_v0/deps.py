@@ -1,3 +1,4 @@
+import time
 from typing import AsyncGenerator
 
 import redis.asyncio as redis
@@ -7,19 +8,34 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models, usecase
 from app.core.settings import settings
-from app.db.session import async_session
+from app.db.session import async_readonly_session, async_session
 from app.utils import errors
 
 reusable_oauth2 = OAuth2PasswordBearer(tokenUrl="api/v0/auth/access-token")
 
 
-async def get_db() -> AsyncGenerator:
+async def get_db(request: Request) -> AsyncGenerator:
     """
-    Dependency function that yields db sessions
+    Dependency function that yields db sessions, committed by `UnitOfWorkRoute` once the
+    endpoint returns
     """
     async with async_session() as session:
+        request.state.db = session
+        yield session
+
+
+async def get_db_readonly(request: Request) -> AsyncGenerator:
+    """
+    Dependency function that yields db sessions reading from a replica, or from the primary
+    for clients whose requests wrote in the last `POSTGRES.REPLICA_STICKY_DURATION` seconds
+    """
+    if request.session.get("read_primary_until", 0) > time.time():
+        session = async_session()
+    else:
+        session = await async_readonly_session()
+    async with session:
+        request.state.db_readonly = session
         yield session
-        await session.commit()
 
 
 async def get_redis(request: Request) -> redis.Redis:
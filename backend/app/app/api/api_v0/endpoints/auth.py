@@ -7,8 +7,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models, schemas, usecase
 from app.api.api_v0 import deps
+from app.api.routing import UnitOfWorkRoute
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
 
 @router.post("/access-token", response_model=schemas.Token)
@@ -1,13 +1,19 @@
 from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends
+import redis.asyncio as redis
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models, schemas, usecase
 from app.api.api_v0 import deps
+from app.api.conditional import conditional_response
+from app.api.routing import UnitOfWorkRoute
+from app.core.settings import settings
 from app.utils import errors
+from app.utils.export import export_rows, ExportFormat
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
 CurrentUser = Annotated[models.User, Depends(deps.get_current_active_user)]
 CurrentSuperUser = Annotated[models.User, Depends(deps.get_current_active_superuser)]
@@ -16,72 +22,228 @@ CurrentSuperUser = Annotated[models.User, Depends(deps.get_current_active_superu
 @router.get("/", response_model=schemas.SuccessfulResponse[list[schemas.Item]])
 async def read_items(
     *,
-    db: AsyncSession = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db_readonly),
+    connection: redis.Redis = Depends(deps.get_redis),
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = None,
+    count: schemas.CountStrategy | None = None,
     current_user: CurrentUser,
 ) -> Any:
     """
     Retrieve items.
+
+    Pass the `pagination.next_cursor` of a response as `cursor` to fetch the next page
+    without the cost of a deep `skip`. Pass `count` to also get `pagination.total`.
     """
-    return schemas.create_successful_response(
-        await usecase.item.get_multi(db, offset=skip, limit=limit)
+    items, next_cursor = (
+        await usecase.item.get_page(db, cursor=cursor, offset=skip, limit=limit)
         if current_user.is_superuser
-        else await usecase.item.get_multi_by_owner(
-            db=db, owner_id=current_user.id, offset=skip, limit=limit
+        else await usecase.item.get_page_by_owner(
+            db=db, owner_id=current_user.id, cursor=cursor, offset=skip, limit=limit
         )
     )
+    total = None
+    if count is not None:
+        total = (
+            await usecase.item.count(db, connection=connection, strategy=count)
+            if current_user.is_superuser
+            else await usecase.item.count_by_owner(
+                db, connection=connection, owner_id=current_user.id, strategy=count
+            )
+        )
+    return schemas.create_successful_response(
+        items,
+        pagination=schemas.Pagination(next_cursor=next_cursor, total=total, total_strategy=count),
+    )
+
+
+@router.get("/search", response_model=schemas.SuccessfulResponse[list[schemas.Item]])
+async def search_items(
+    *,
+    db: AsyncSession = Depends(deps.get_db_readonly),
+    q: str = Query(..., min_length=1, max_length=256),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    current_user: CurrentUser,
+) -> Any:
+    """
+    Search items by the words of their title and description (web search syntax:
+    `"exact phrase"`, `or`, `-excluded`) or by a title that is spelled alike, best
+    matches first.
+    """
+    items, next_cursor = await usecase.item.search(
+        db=db,
+        query=q,
+        owner_id=None if current_user.is_superuser else current_user.id,
+        cursor=cursor,
+        limit=limit,
+    )
+    return schemas.create_successful_response(
+        items, pagination=schemas.Pagination(next_cursor=next_cursor, total_strategy=None)
+    )
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_items(
+    *,
+    db: AsyncSession = Depends(deps.get_db_readonly),
+    export_format: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+    current_user: CurrentUser,
+) -> Any:
+    """
+    Export items as NDJSON or CSV, streamed from a server-side cursor.
+    """
+    batches = (
+        usecase.item.stream(db, options=())
+        if current_user.is_superuser
+        else usecase.item.stream_by_owner(db=db, owner_id=current_user.id, options=())
+    )
+    return StreamingResponse(
+        export_rows(
+            batches,
+            fields=("id", "title", "description", "owner_id", "created_at", "updated_at"),
+            export_format=export_format,
+        ),
+        media_type=export_format.media_type,
+        headers={"Content-Disposition": f"attachment; filename=items.{export_format.value}"},
+    )
 
 
 @router.post("/", response_model=schemas.SuccessfulResponse[schemas.Item])
 async def create_item(
     *,
     db: AsyncSession = Depends(deps.get_db),
+    connection: redis.Redis = Depends(deps.get_redis),
     item_in: schemas.ItemCreate,
     current_user: CurrentUser,
 ) -> Any:
     """
     Create new item.
     """
-    item = await usecase.item.create_with_owner(db=db, obj_in=item_in, owner_id=current_user.id)
+    item = await usecase.item.create_with_owner(
+        db=db, connection=connection, obj_in=item_in, owner_id=current_user.id
+    )
     return schemas.create_successful_response(item)
 
 
+@router.post("/bulk", response_model=schemas.SuccessfulResponse[schemas.ItemBulkCreated])
+async def create_items(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    connection: redis.Redis = Depends(deps.get_redis),
+    items_in: list[schemas.ItemCreate],
+    returning: bool = True,
+    current_user: CurrentUser,
+) -> Any:
+    """
+    Create many items.
+
+    With `returning` the created items are sent back, otherwise they are loaded with `COPY`
+    and only counted, which allows larger batches.
+    """
+    max_size = settings.BULK.RETURNING_MAX_SIZE if returning else settings.BULK.MAX_SIZE
+    if len(items_in) > max_size:
+        raise errors.ErrBadRequest(f"at most {max_size} items can be created per request")
+
+    if returning:
+        items = await usecase.item.create_many_with_owner(
+            db=db, connection=connection, objs_in=items_in, owner_id=current_user.id
+        )
+        # The rows are serialized against the response model, no need to validate them here
+        return schemas.create_successful_response({"count": len(items), "items": items})
+
+    count = await usecase.item.copy_many_with_owner(
+        db=db, connection=connection, objs_in=items_in, owner_id=current_user.id
+    )
+    return schemas.create_successful_response(schemas.ItemBulkCreated(count=count))
+
+
 @router.put("/{id}", response_model=schemas.SuccessfulResponse[schemas.Item])
 async def update_item(
     *,
     db: AsyncSession = Depends(deps.get_db),
+    connection: redis.Redis = Depends(deps.get_redis),
     id: int,  # pylint: disable=redefined-builtin
     item_in: schemas.ItemUpdate,
     current_user: CurrentUser,
 ) -> Any:
     """
     Update an item.
+
+    Pass the `updated_at` of the item as read to reject the update with 409 if the item has
+    been modified since.
     """
+    update_data = item_in.dict(exclude_unset=True, exclude={"updated_at"})
+    item = (
+        await usecase.item.update_by_id(
+            db=db,
+            id=id,
+            obj_in=update_data,
+            updated_at=item_in.updated_at,
+            connection=connection,
+        )
+        if current_user.is_superuser
+        else await usecase.item.update_by_owner(
+            db=db,
+            id=id,
+            owner_id=current_user.id,
+            obj_in=update_data,
+            updated_at=item_in.updated_at,
+            connection=connection,
+        )
+    )
+    if item is not None:
+        return schemas.create_successful_response(item)
+
+    # Nothing was updated, look the item up to tell why
     item = await usecase.item.get(db=db, id=id)
     if not item:
         raise errors.ErrNotFound("item not found")
     if not current_user.is_superuser and (item.owner_id != current_user.id):
         raise errors.ErrNotEnoughPrivileges("not enough permissions")
-    item = await usecase.item.update(db=db, db_obj=item, obj_in=item_in)
-    return schemas.create_successful_response(item)
+    raise errors.ErrConflict("item has been modified since it was read")
 
 
-@router.get("/{id}", response_model=schemas.SuccessfulResponse[schemas.Item])
-async def read_item(
+@router.get(
+    "/{id}",
+    response_model=schemas.SuccessfulResponse[schemas.Item],
+    responses={304: {"description": "Not modified"}},
+)
+async def read_item(  # pylint: disable=too-many-arguments
     *,
-    db: AsyncSession = Depends(deps.get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(deps.get_db_readonly),
+    connection: redis.Redis = Depends(deps.get_redis),
     id: int,  # pylint: disable=redefined-builtin
     current_user: CurrentUser,
 ) -> Any:
     """
     Get item by ID.
+
+    Send the `ETag` or `Last-Modified` of the item as `If-None-Match` or `If-Modified-Since`
+    to get a 304 without body while it is unchanged.
     """
+    version = await usecase.item.get_version(connection=connection, id=id)
+    if version is not None:
+        owner_id, updated_at = version
+        if current_user.is_superuser or owner_id == current_user.id:
+            not_modified = conditional_response(request, response, id=id, updated_at=updated_at)
+            if not_modified is not None:
+                return not_modified
+
     item = await usecase.item.get(db=db, id=id)
     if not item:
         raise errors.ErrNotFound("item not found")
     if not current_user.is_superuser and (item.owner_id != current_user.id):
         raise errors.ErrNotEnoughPrivileges("not enough permissions")
+    if version is None:
+        await usecase.item.set_version(connection=connection, db_obj=item)
+
+    not_modified = conditional_response(request, response, id=item.id, updated_at=item.updated_at)
+    if not_modified is not None:
+        return not_modified
     return schemas.create_successful_response(item)
 
 
@@ -89,6 +251,7 @@ async def read_item(
 async def delete_item(
     *,
     db: AsyncSession = Depends(deps.get_db),
+    connection: redis.Redis = Depends(deps.get_redis),
     id: int,  # pylint: disable=redefined-builtin
     current_user: CurrentUser,
 ) -> Any:
@@ -103,4 +266,6 @@ async def delete_item(
     if not current_user.is_superuser and (item.owner_id != current_user.id):
         raise errors.ErrNotEnoughPrivileges("not enough permissions")
 
-    return schemas.create_successful_response(await usecase.item.delete(db=db, db_obj=item))
+    return schemas.create_successful_response(
+        await usecase.item.delete(db=db, db_obj=item, connection=connection)
+    )
@@ -0,0 +1,23 @@
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends
+
+from app import models, schemas
+from app.api.api_v0 import deps
+from app.api.routing import UnitOfWorkRoute
+from app.core.metrics import metrics
+
+router = APIRouter(route_class=UnitOfWorkRoute)
+
+CurrentSuperUser = Annotated[models.User, Depends(deps.get_current_active_superuser)]
+
+
+@router.get("/", response_model=schemas.SuccessfulResponse[dict[str, dict[str, Any]]])
+async def read_metrics(
+    *,
+    current_user: CurrentSuperUser,  # pylint: disable=unused-argument
+) -> Any:
+    """
+    Retrieve in-process metrics of this worker.
+    """
+    return schemas.create_successful_response(metrics.collect())
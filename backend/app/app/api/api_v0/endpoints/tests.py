@@ -6,9 +6,9 @@ from loguru import logger
 
 from app import models, schemas
 from app.api.api_v0 import deps
-from app.tasks import test_celery as test_celery_task
+from app.api.routing import UnitOfWorkRoute
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
 
 CurrentSuperUser = Annotated[models.User, Depends(deps.get_current_active_superuser)]
@@ -23,6 +23,9 @@ async def test_celery(
     """
     Test Celery worker.
     """
+    # Imported here so API processes only load celery/kombu when a task is sent
+    from app.tasks import test_celery as test_celery_task  # pylint: disable=import-outside-toplevel
+
     task = test_celery_task.delay(msg.msg)
     msg = task.get()
     return schemas.create_successful_response(data={"msg": str(msg)})
@@ -1,17 +1,21 @@
 from typing import Annotated, Any
 
 import redis.asyncio as redis
-from fastapi import APIRouter, Body, Depends
+from fastapi import APIRouter, Body, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic.networks import EmailStr
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models, schemas, usecase
 from app.api.api_v0 import deps
+from app.api.conditional import conditional_response
+from app.api.routing import UnitOfWorkRoute
 from app.core.settings import settings
 from app.utils import errors
-from app.utils.encoders import jsonable_encoder_sqlalchemy
+from app.utils.encoders import extract_fields
+from app.utils.export import export_rows, ExportFormat
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
 CurrentUser = Annotated[models.User, Depends(deps.get_current_active_user)]
 CurrentSuperUser = Annotated[models.User, Depends(deps.get_current_active_superuser)]
@@ -20,16 +24,50 @@ CurrentSuperUser = Annotated[models.User, Depends(deps.get_current_active_superu
 @router.get("/", response_model=schemas.SuccessfulResponse[list[schemas.User]])
 async def read_users(
     *,
-    db: AsyncSession = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db_readonly),
+    connection: redis.Redis = Depends(deps.get_redis),
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = None,
+    count: schemas.CountStrategy | None = None,
     current_user: CurrentSuperUser,  # pylint: disable=unused-argument
 ) -> Any:
     """
     Retrieve users.
+
+    Pass the `pagination.next_cursor` of a response as `cursor` to fetch the next page
+    without the cost of a deep `skip`. Pass `count` to also get `pagination.total`.
     """
+    users, next_cursor = await usecase.user.get_page(db, cursor=cursor, offset=skip, limit=limit)
+    total = (
+        await usecase.user.count(db, connection=connection, strategy=count)
+        if count is not None
+        else None
+    )
     return schemas.create_successful_response(
-        await usecase.user.get_multi(db, offset=skip, limit=limit)
+        users,
+        pagination=schemas.Pagination(next_cursor=next_cursor, total=total, total_strategy=count),
+    )
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_users(
+    *,
+    db: AsyncSession = Depends(deps.get_db_readonly),
+    export_format: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+    current_user: CurrentSuperUser,  # pylint: disable=unused-argument
+) -> Any:
+    """
+    Export users as NDJSON or CSV, streamed from a server-side cursor.
+    """
+    return StreamingResponse(
+        export_rows(
+            usecase.user.stream(db),
+            fields=tuple(schemas.User.__fields__),
+            export_format=export_format,
+        ),
+        media_type=export_format.media_type,
+        headers={"Content-Disposition": f"attachment; filename=users.{export_format.value}"},
     )
 
 
@@ -37,6 +75,7 @@ async def read_users(
 async def create_user(
     *,
     db: AsyncSession = Depends(deps.get_db),
+    connection: redis.Redis = Depends(deps.get_redis),
     user_in: schemas.UserCreate,
     current_user: CurrentSuperUser,  # pylint: disable=unused-argument
 ) -> Any:
@@ -46,7 +85,7 @@ async def create_user(
     user = await usecase.user.get_by_email(db, email=user_in.email)
     if user:
         raise errors.ErrExistsEmail("email already exists")
-    user = await usecase.user.create(db, **user_in.dict())
+    user = await usecase.user.create(db, connection=connection, obj_in=user_in)
 
     # TODO: Send email # pylint: disable=fixme
     return schemas.create_successful_response(user)
@@ -65,7 +104,7 @@ async def update_user_me(
     """
     Update own user.
     """
-    current_user_data = jsonable_encoder_sqlalchemy(current_user)
+    current_user_data = extract_fields(current_user)
     user_in = schemas.UserUpdate(**current_user_data)
     if password is not None:
         user_in.password = password
@@ -79,14 +118,27 @@ async def update_user_me(
     return schemas.create_successful_response(user)
 
 
-@router.get("/me", response_model=schemas.SuccessfulResponse[schemas.User])
+@router.get(
+    "/me",
+    response_model=schemas.SuccessfulResponse[schemas.User],
+    responses={304: {"description": "Not modified"}},
+)
 async def read_user_me(
     *,
+    request: Request,
+    response: Response,
     current_user: CurrentUser,
 ) -> Any:
     """
     Get current user.
+
+    Answers 304 without body when `If-None-Match` or `If-Modified-Since` match the user.
     """
+    not_modified = conditional_response(
+        request, response, id=current_user.id, updated_at=current_user.updated_at
+    )
+    if not_modified is not None:
+        return not_modified
     return schemas.create_successful_response(current_user)
 
 
@@ -94,6 +146,7 @@ async def read_user_me(
 async def create_user_open(
     *,
     db: AsyncSession = Depends(deps.get_db),
+    connection: redis.Redis = Depends(deps.get_redis),
     password: str = Body(...),
     email: EmailStr = Body(...),
     full_name: str = Body(None),
@@ -107,13 +160,19 @@ async def create_user_open(
     if user:
         raise errors.ErrExistsEmail("email already exists")
     user_in = schemas.UserCreate(password=password, email=email, full_name=full_name)
-    user = await usecase.user.create(db, **user_in.dict())
+    user = await usecase.user.create(db, connection=connection, obj_in=user_in)
     return schemas.create_successful_response(user)
 
 
-@router.get("/{user_id}", response_model=schemas.SuccessfulResponse[schemas.User])
-async def read_user_by_id(
+@router.get(
+    "/{user_id}",
+    response_model=schemas.SuccessfulResponse[schemas.User],
+    responses={304: {"description": "Not modified"}},
+)
+async def read_user_by_id(  # pylint: disable=too-many-arguments
     *,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(deps.get_db),
     connection: redis.Redis = Depends(deps.get_redis),
     user_id: int,
@@ -121,14 +180,18 @@ async def read_user_by_id(
 ) -> Any:
     """
     Get a specific user by id.
+
+    Answers 304 without body when `If-None-Match` or `If-Modified-Since` match the user.
+    The user is read from the cache, postgres is only queried on a cache miss.
     """
     user = await usecase.user.get(db=db, connection=connection, id=user_id)
     if not user:
         raise errors.ErrNotFound("user not found")
-    if user.id == current_user.id:
-        return schemas.create_successful_response(user)
-    if not current_user.is_superuser:
+    if user.id != current_user.id and not current_user.is_superuser:
         raise errors.ErrNotEnoughPrivileges("not enough permissions")
+    not_modified = conditional_response(request, response, id=user.id, updated_at=user.updated_at)
+    if not_modified is not None:
+        return not_modified
     return schemas.create_successful_response(user)
 
 
@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response, status
+
+
+def _etag(id: int, updated_at: datetime) -> str:  # pylint: disable=redefined-builtin
+    return f'W/"{id}-{round(updated_at.timestamp() * 1_000_000):x}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # Weak comparison, ignores the W/ prefix of both sides
+    opaque_tag = etag.removeprefix("W/")
+    return any(
+        tag == "*" or tag.removeprefix("W/") == opaque_tag
+        for tag in (tag.strip() for tag in if_none_match.split(","))
+    )
+
+
+def _not_modified_since(if_modified_since: str, updated_at: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have a resolution of one second
+    return int(updated_at.timestamp()) <= since.timestamp()
+
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    id: int,  # pylint: disable=redefined-builtin
+    updated_at: datetime,
+) -> Response | None:
+    """
+    Set the `ETag` and `Last-Modified` of a row version on `response`. Returns a 304 response
+    to send instead of the body when the request's `If-None-Match`, or `If-Modified-Since`
+    without it, matches that version.
+    **Parameters**
+    * `request`: The conditional request
+    * `response`: The response injected in the endpoint
+    * `id`: Id of the returned row
+    * `updated_at`: Last update of the returned row
+    """
+    headers = {
+        "ETag": _etag(id, updated_at),
+        "Last-Modified": format_datetime(updated_at.astimezone(timezone.utc), usegmt=True),
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if (
+        _etag_matches(if_none_match, headers["ETag"])
+        if if_none_match is not None
+        else if_modified_since is not None and _not_modified_since(if_modified_since, updated_at)
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
+    return None
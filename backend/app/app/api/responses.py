@@ -0,0 +1,22 @@
+from typing import Any
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.dict(by_alias=True)
+    return jsonable_encoder(value)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    `JSONResponse` rendered with orjson, which encodes datetimes, enums and UUIDs itself and
+    hands everything else (pydantic models, decimals...) to `jsonable_encoder`.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,90 @@
+import asyncio
+import time
+from functools import wraps
+from typing import Any, Callable, Coroutine
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from app.api.responses import FastJSONResponse
+from app.core.settings import settings
+from app.db.unit_of_work import commit
+from app.schemas.response import SuccessfulResponse
+from app.utils.encoders import compile_serializer
+
+
+class FastResponseRoute(APIRoute):
+    """
+    Renders the `SuccessfulResponse` returned by an endpoint with a serializer compiled from
+    its `response_model` and orjson. FastAPI would otherwise validate the envelope against
+    `response_model` and then run it through `jsonable_encoder`, the OpenAPI schema is still
+    generated from `response_model`.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        if self._fast_response_supported():
+            assert self.dependant.call is not None  # nosec
+            self.dependant.call = self._fast_response(self.dependant.call)
+        return super().get_route_handler()
+
+    def _fast_response_supported(self) -> bool:
+        # The `response_model_*` filters are only applied by FastAPI
+        return (
+            self.response_field is not None
+            and asyncio.iscoroutinefunction(self.dependant.call)
+            and not self.response_model_include
+            and not self.response_model_exclude
+            and not self.response_model_exclude_unset
+            and not self.response_model_exclude_defaults
+            and not self.response_model_exclude_none
+        )
+
+    def _fast_response(self, call: Callable[..., Any]) -> Callable[..., Any]:
+        assert self.response_field is not None  # nosec
+        serialize = compile_serializer(self.response_field)
+        status_code = self.status_code or 200
+        response_param_name = self.dependant.response_param_name
+
+        @wraps(call)
+        async def fast_response_call(**values: Any) -> Any:
+            content = await call(**values)
+            if not isinstance(content, SuccessfulResponse):
+                return content
+            response = FastJSONResponse(serialize(content), status_code=status_code)
+            if response_param_name is not None:
+                # FastAPI drops the injected response once the endpoint returns a response
+                sub_response = values[response_param_name]
+                if sub_response.status_code:
+                    response.status_code = sub_response.status_code
+                response.headers.raw.extend(sub_response.headers.raw)
+            return response
+
+        return fast_response_call
+
+
+class UnitOfWorkRoute(FastResponseRoute):
+    """
+    Commits the request's database sessions, opened by `deps.get_db` and
+    `deps.get_db_readonly`, once the endpoint has returned and before the response is sent,
+    so a failing commit fails the request. After a write the client reads from the primary
+    for a while (read-your-writes with replicas).
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        route_handler = super().get_route_handler()
+
+        async def unit_of_work_route_handler(request: Request) -> Response:
+            response = await route_handler(request)
+            wrote = False
+            for name in ("db", "db_readonly"):
+                db = getattr(request.state, name, None)
+                if db is not None:
+                    wrote = wrote or db.info.get("wrote", False)
+                    await commit(db)
+            if wrote and settings.POSTGRES.REPLICA_URIS:
+                request.session["read_primary_until"] = (
+                    time.time() + settings.POSTGRES.REPLICA_STICKY_DURATION
+                )
+            return response
+
+        return unit_of_work_route_handler
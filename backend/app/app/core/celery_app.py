@@ -1,4 +1,5 @@
 from celery import Celery
+from kombu import Queue
 
 from app.core.settings import settings
 
@@ -12,7 +13,7 @@ celery_app = Celery(
     enable_utc=settings.CELERY.ENABLE_UTC,
     timezone=settings.CELERY.TIMEZONE,
     task_default_queue=settings.CELERY.DEFAULT_QUEUE,
-    task_queues=settings.CELERY.QUEUES,
+    task_queues=tuple(Queue(name) for name in settings.CELERY.QUEUES),
     imports=settings.CELERY.IMPORTS,
     beat_schedule=settings.CELERY.BEAT_SCHEDULE,
 )
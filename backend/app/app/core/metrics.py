@@ -0,0 +1,44 @@
+from typing import Any, Callable
+
+__all__ = ["Timer", "MetricsRegistry", "metrics"]
+
+
+class Timer:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def dict(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+        }
+
+
+class MetricsRegistry:
+    """
+    In-process registry of named metric providers, collected on demand
+    """
+
+    def __init__(self) -> None:
+        self._providers: dict[str, Callable[[], dict[str, Any]]] = {}
+
+    def register(self, name: str, provider: Callable[[], dict[str, Any]]) -> None:
+        self._providers[name] = provider
+
+    def collect(self) -> dict[str, dict[str, Any]]:
+        return {name: provider() for name, provider in self._providers.items()}
+
+
+metrics = MetricsRegistry()
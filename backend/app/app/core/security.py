@@ -1,13 +1,23 @@
+import asyncio
+import hashlib
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Callable, TypeVar
 
 from jose import jwt
 from passlib.context import CryptContext
 
+from app.core.metrics import metrics, Timer
 from app.core.settings import settings
+from app.utils import errors
+from app.utils.cache import TTLCache
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+T = TypeVar("T")
+
 
 def create_token(
     subject: str | Any,
@@ -31,3 +41,120 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+
+def _timed_verify_password(plain_password: str, hashed_password: str) -> tuple[bool, float]:
+    start = time.perf_counter()
+    return verify_password(plain_password, hashed_password), time.perf_counter() - start
+
+
+def _timed_get_password_hash(password: str) -> tuple[str, float]:
+    start = time.perf_counter()
+    return get_password_hash(password), time.perf_counter() - start
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a bounded process pool so it never blocks the event loop.
+    **Parameters**
+    * `workers`: Number of worker processes
+    * `max_queue`: Number of calls allowed to wait for a free worker before rejecting with 503
+    """
+
+    def __init__(self, workers: int, max_queue: int) -> None:
+        self.workers = workers
+        self.max_queue = max_queue
+        self.pending = 0
+        self.rejected = 0
+        self.queue_wait = Timer()
+        self.hash_time = Timer()
+        self._executor: ProcessPoolExecutor | None = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def _run(self, func: Callable[..., tuple[T, float]], *args: Any) -> T:
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise errors.ErrServiceUnavailable("password hashing service is overloaded")
+
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            result, elapsed = await asyncio.get_running_loop().run_in_executor(
+                self.executor, func, *args
+            )
+        finally:
+            self.pending -= 1
+
+        self.hash_time.observe(elapsed)
+        self.queue_wait.observe(max(time.perf_counter() - start - elapsed, 0.0))
+        return result
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(_timed_verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_timed_get_password_hash, password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "rejected": self.rejected,
+            "queue_wait": self.queue_wait.dict(),
+            "hash_time": self.hash_time.dict(),
+        }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASHER.WORKERS, max_queue=settings.PASSWORD_HASHER.MAX_QUEUE
+)
+metrics.register("password_hasher", password_hasher.stats)
+
+
+class VerifiedTokenCache:
+    """
+    Remembers the subject of tokens that already passed signature verification.
+    Entries are keyed by a digest of the secret key and the token, so rotating the secret
+    makes every cached entry unreachable, and never outlive the token's `exp`.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.cache: TTLCache[bytes, int] = TTLCache(max_size=max_size, ttl=ttl)
+
+    @staticmethod
+    def _key(token: str, secret_key: str) -> bytes:
+        return hashlib.sha256(f"{secret_key}:{token}".encode()).digest()
+
+    def get(self, token: str, secret_key: str) -> int | None:
+        return self.cache.get(self._key(token=token, secret_key=secret_key))
+
+    def set(self, token: str, secret_key: str, sub: int, exp: float) -> None:
+        self.cache.set(self._key(token=token, secret_key=secret_key), sub, expires_at=exp)
+
+    def revoke(self, token: str, secret_key: str) -> None:
+        self.cache.delete(self._key(token=token, secret_key=secret_key))
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return self.cache.stats()
+
+
+verified_token_cache = VerifiedTokenCache(
+    max_size=settings.JWT.VERIFIED_TOKEN_CACHE_SIZE, ttl=settings.JWT.VERIFIED_TOKEN_CACHE_TTL
+)
+metrics.register("verified_token_cache", verified_token_cache.stats)
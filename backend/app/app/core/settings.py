@@ -1,6 +1,5 @@
 from typing import Any
 
-from kombu import Queue
 from pydantic import BaseModel, BaseSettings, EmailStr, HttpUrl, PostgresDsn, validator
 
 
@@ -21,7 +20,7 @@ class CelerySettings(BaseModel):
     ENABLE_UTC = True
     TIMEZONE: str = "Asia/Ho_Chi_Minh"
     DEFAULT_QUEUE: str = "default"
-    QUEUES = (Queue("default"), Queue("priority_high"))
+    QUEUES: tuple[str, ...] = ("default", "priority_high")
     IMPORTS = ("app.tasks",)
     BEAT_SCHEDULE: dict = {}
 
@@ -32,6 +31,9 @@ class JwtSettings(BaseModel):
     ACCESS_TOKEN_EXPIRE_DURATION: int = 60 * 24 * 8
     REFRESH_TOKEN_SECRET_KEY: str
     REFRESH_TOKEN_EXPIRE_DURATION: int = 60 * 24 * 8
+    REFRESH_TOKEN_MAX_SESSIONS: int = 10
+    VERIFIED_TOKEN_CACHE_SIZE: int = 10000
+    VERIFIED_TOKEN_CACHE_TTL: int = 60 * 5
 
 
 class PostgresSettings(BaseModel):
@@ -41,6 +43,16 @@ class PostgresSettings(BaseModel):
     DB: str
     PORT: str
     DATABASE_URI: PostgresDsn | None = None
+    STATEMENT_CACHE_SIZE: int = 100
+    PREPARED_STATEMENT_CACHE_SIZE: int = 100
+    COMMAND_TIMEOUT: float | None = 60
+    # Streaming replicas serving `get_db_readonly`, as a JSON list of DSNs
+    REPLICA_URIS: list[PostgresDsn] = []
+    # Replicas lagging more than this many seconds are skipped until they catch up
+    REPLICA_MAX_LAG: float = 5
+    REPLICA_LAG_CHECK_INTERVAL: float = 1
+    # Seconds a client keeps reading from the primary after one of its requests wrote
+    REPLICA_STICKY_DURATION: float = 10
 
     @validator("DATABASE_URI", pre=True, always=True)
     def assemble_db_connection(  # pylint: disable=no-self-argument
@@ -66,9 +78,24 @@ class PostgresSettings(BaseModel):
             else self.DATABASE_URI
         )
 
+    @property
+    def ASYNC_REPLICA_URIS(self) -> list[str]:
+        return [uri.replace("postgresql://", "postgresql+asyncpg://") for uri in self.REPLICA_URIS]
+
+
+class PasswordHasherSettings(BaseModel):
+    WORKERS: int = 2
+    MAX_QUEUE: int = 32
+
 
 class SQLAlchemySettings(BaseModel):
     ECHO: bool = False
+    POOL_SIZE: int = 20
+    MAX_OVERFLOW: int = 10
+    POOL_TIMEOUT: float = 30
+    POOL_RECYCLE: int = 60 * 30
+    # Development and tests only: fail any request that issues more statements than this
+    QUERY_BUDGET: int | None = None
 
 
 class FirstUserSuperSettings(BaseModel):
@@ -90,10 +117,46 @@ class UserSettings(BaseModel):
     OPEN_REGISTRATION: bool = False
 
 
+class BulkSettings(BaseModel):
+    # Rows per request sent back by INSERT ... RETURNING
+    RETURNING_MAX_SIZE: int = 1000
+    # Rows per request loaded with COPY
+    MAX_SIZE: int = 50000
+
+
+class CompressionSettings(BaseModel):
+    ENABLED: bool = True
+    # Smaller bodies are sent uncompressed, gzip wouldn't save enough to be worth it
+    MINIMUM_SIZE: int = 1024
+    # zlib level, from 1 (fastest) to 9 (smallest)
+    LEVEL: int = 6
+
+
+class CacheSettings(BaseModel):
+    USER_TTL: int = 60 * 60
+    USER_TTL_JITTER: int = 60 * 5
+    USER_LOCK_TTL: int = 5
+    USER_LOCK_WAIT: float = 0.05
+    USER_LOCK_RETRIES: int = 20
+    USER_LOCAL_MAX_SIZE: int = 10000
+    USER_LOCAL_TTL: int = 30
+    USER_INVALIDATION_CHANNEL: str = "Invalidate:User"
+    COUNT_TTL: int = 60 * 5
+    VERSION_TTL: int = 60 * 60
+    # Has to outlive the replica lag allowed by DATABASE.REPLICA_MAX_LAG
+    VERSION_TOMBSTONE_TTL: int = 60
+
+
 class RedisSettings(BaseModel):
     HOST: str
     DB: int
     PORT: int
+    UNIX_SOCKET_PATH: str | None = None
+    MAX_CONNECTIONS: int = 50
+    POOL_TIMEOUT: float = 5
+    SOCKET_TIMEOUT: float | None = 5
+    SOCKET_CONNECT_TIMEOUT: float | None = 5
+    HEALTH_CHECK_INTERVAL: int = 30
 
 
 class Settings(BaseSettings):
@@ -102,10 +165,14 @@ class Settings(BaseSettings):
     JWT: JwtSettings
     POSTGRES: PostgresSettings
     SQLALCHEMY: SQLAlchemySettings = SQLAlchemySettings()
+    PASSWORD_HASHER: PasswordHasherSettings = PasswordHasherSettings()
     FIRST_SUPERUSER: FirstUserSuperSettings
     SENTRY: SentrySettings = SentrySettings()
     USER: UserSettings = UserSettings()
     REDIS: RedisSettings
+    CACHE: CacheSettings = CacheSettings()
+    BULK: BulkSettings = BulkSettings()
+    COMPRESSION: CompressionSettings = CompressionSettings()
 
     class Config:
         case_sensitive = True
@@ -0,0 +1,71 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+from sqlalchemy import Engine, event
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+class QueryCounter:
+    """
+    Statements executed while the counter is active, see `count_queries`.
+    **Parameters**
+    * `budget`: Raise `QueryBudgetExceeded` on the first statement over this number
+    """
+
+    def __init__(self, budget: int | None = None) -> None:
+        self.budget = budget
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def add(self, statement: str) -> None:
+        self.statements.append(statement)
+        if self.budget is not None and self.count > self.budget:
+            raise QueryBudgetExceeded(
+                f"{self.count} statements exceed the budget of {self.budget}, "
+                f"last one: {statement}"
+            )
+
+
+_query_counter: ContextVar[QueryCounter | None] = ContextVar("query_counter", default=None)
+
+
+def _before_cursor_execute(  # pylint: disable=too-many-arguments
+    conn: Any,  # pylint: disable=unused-argument
+    cursor: Any,  # pylint: disable=unused-argument
+    statement: str,
+    parameters: Any,  # pylint: disable=unused-argument
+    context: Any,  # pylint: disable=unused-argument
+    executemany: bool,  # pylint: disable=unused-argument
+) -> None:
+    counter = _query_counter.get()
+    if counter is not None:
+        counter.add(statement)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Report the statements executed on `engine` to the active `QueryCounter`.
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+
+
+@contextmanager
+def count_queries(budget: int | None = None) -> Iterator[QueryCounter]:
+    """
+    Count the statements executed in the current context (request, task, test) on
+    instrumented engines.
+    """
+    counter = QueryCounter(budget=budget)
+    token = _query_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _query_counter.reset(token)
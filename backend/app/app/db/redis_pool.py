@@ -0,0 +1,71 @@
+import time
+from typing import Any
+
+from redis.asyncio import BlockingConnectionPool, UnixDomainSocketConnection
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.core.metrics import Timer
+from app.core.settings import settings
+
+
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    """
+    BlockingConnectionPool that records how often and how long callers wait for a connection.
+    """
+
+    # Every connection created by the pool, set by `BlockingConnectionPool.reset`
+    _connections: list[Any]
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.waits = 0
+        self.failed_waits = 0
+        self.wait_time = Timer()
+
+    async def get_connection(self, command_name: Any, *keys: Any, **options: Any) -> Any:
+        if not self.pool.empty():
+            return await super().get_connection(command_name, *keys, **options)
+
+        self.waits += 1
+        start = time.perf_counter()
+        try:
+            return await super().get_connection(command_name, *keys, **options)
+        except RedisConnectionError:
+            self.failed_waits += 1
+            raise
+        finally:
+            self.wait_time.observe(time.perf_counter() - start)
+
+    def stats(self) -> dict[str, Any]:
+        in_use = self.max_connections - self.pool.qsize()
+        return {
+            "max_connections": self.max_connections,
+            "created": len(self._connections),
+            "in_use": in_use,
+            "idle": len(self._connections) - in_use,
+            "waits": self.waits,
+            "failed_waits": self.failed_waits,
+            "wait_time": self.wait_time.dict(),
+        }
+
+
+def create_redis_pool() -> InstrumentedConnectionPool:
+    connection_kwargs: dict[str, Any] = {
+        "db": settings.REDIS.DB,
+        "decode_responses": True,
+        "socket_timeout": settings.REDIS.SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS.SOCKET_CONNECT_TIMEOUT,
+        "health_check_interval": settings.REDIS.HEALTH_CHECK_INTERVAL,
+    }
+    if settings.REDIS.UNIX_SOCKET_PATH is not None:
+        connection_kwargs["connection_class"] = UnixDomainSocketConnection
+        connection_kwargs["path"] = settings.REDIS.UNIX_SOCKET_PATH
+    else:
+        connection_kwargs["host"] = settings.REDIS.HOST
+        connection_kwargs["port"] = settings.REDIS.PORT
+
+    return InstrumentedConnectionPool(
+        max_connections=settings.REDIS.MAX_CONNECTIONS,
+        timeout=settings.REDIS.POOL_TIMEOUT,
+        **connection_kwargs,
+    )
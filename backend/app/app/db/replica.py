@@ -0,0 +1,97 @@
+import asyncio
+from typing import Any, Sequence
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Seconds since the last replayed transaction, 0 when the replica has replayed everything
+# it received (an idle primary doesn't make a replica lag)
+REPLICA_LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+        THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+class ReplicaRouter:
+    """
+    Spreads read-only sessions over the replicas whose replication lag is within `max_lag`.
+    Lags are probed every `check_interval` seconds by `run`, a replica that can't be reached
+    counts as lagging, when none qualifies (or before the first probe) reads fall back to the
+    primary.
+    **Parameters**
+    * `engines`: Engines of the replicas
+    * `max_lag`: Replication lag in seconds above which a replica is skipped
+    * `check_interval`: Seconds between two lag probes
+    """
+
+    def __init__(self, engines: Sequence[AsyncEngine], max_lag: float, check_interval: float):
+        self.engines = list(engines)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lags: list[float | None] = [None] * len(self.engines)
+        self.routed = 0
+        self.fallbacks = 0
+        self._next = 0
+
+    @staticmethod
+    async def _lag(engine: AsyncEngine) -> float:
+        async with engine.connect() as connection:
+            return float(await connection.scalar(REPLICA_LAG_QUERY))
+
+    async def _probe(self, engine: AsyncEngine) -> float | None:
+        # Connecting is bounded too so an unreachable replica doesn't hold back the next
+        # round until the driver's connect timeout
+        try:
+            return await asyncio.wait_for(self._lag(engine), timeout=self.check_interval)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning("replica {} is unavailable: {!r}", engine.url.host, e)
+            return None
+
+    async def check(self) -> None:
+        self.lags = list(await asyncio.gather(*(self._probe(engine) for engine in self.engines)))
+
+    async def run(self) -> None:
+        """
+        Probe the replicas every `check_interval` seconds, for the whole process lifetime.
+        """
+        if not self.engines:
+            return
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
+
+    def choose(self) -> AsyncEngine | None:
+        """
+        Returns the replica for the next read-only session, None to read from the primary.
+        """
+        if not self.engines:
+            return None
+
+        healthy = [
+            engine
+            for engine, lag in zip(self.engines, self.lags, strict=True)
+            if lag is not None and lag <= self.max_lag
+        ]
+        if not healthy:
+            self.fallbacks += 1
+            return None
+
+        self.routed += 1
+        self._next = (self._next + 1) % len(healthy)
+        return healthy[self._next]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "lags": {
+                str(engine.url.host): lag
+                for engine, lag in zip(self.engines, self.lags, strict=True)
+            },
+            "routed": self.routed,
+            "fallbacks": self.fallbacks,
+        }
@@ -1,21 +1,153 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
-from sqlalchemy.orm import sessionmaker
+import time
+from functools import cache
+from typing import Any
 
+from sqlalchemy import create_engine, Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import (
+    async_sessionmaker,
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql.dml import UpdateBase
+
+from app.core.metrics import metrics, Timer
 from app.core.settings import settings
+from app.db.query_counter import instrument_engine
+from app.db.replica import ReplicaRouter
 
-async_engine = create_async_engine(
-    settings.POSTGRES.ASYNC_DATABASE_URI,  # type: ignore
-    echo=settings.SQLALCHEMY.ECHO,
-    pool_pre_ping=True,
-    future=True,
-)
-async_session = async_sessionmaker(async_engine, expire_on_commit=False)
 
-engine = create_engine(
-    settings.POSTGRES.DATABASE_URI,  # type: ignore
-    echo=settings.SQLALCHEMY.ECHO,
-    pool_pre_ping=True,
-    future=True,
-)
-session = sessionmaker(engine, autocommit=False, autoflush=False)
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool that records checkout wait times and timeouts.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.checkout_time = Timer()
+        self.timeouts = 0
+
+    def _do_get(self) -> Any:
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.checkout_time.observe(time.perf_counter() - start)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "timeouts": self.timeouts,
+            "checkout_time": self.checkout_time.dict(),
+        }
+
+
+# Engines and session factories are built on first use, so importing this module doesn't
+# load a database driver or open a pool in processes that never touch the database
+def _create_async_engine(url: str, name: str) -> AsyncEngine:
+    async_engine = create_async_engine(
+        url,
+        echo=settings.SQLALCHEMY.ECHO,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.SQLALCHEMY.POOL_SIZE,
+        max_overflow=settings.SQLALCHEMY.MAX_OVERFLOW,
+        pool_timeout=settings.SQLALCHEMY.POOL_TIMEOUT,
+        pool_recycle=settings.SQLALCHEMY.POOL_RECYCLE,
+        pool_pre_ping=True,
+        future=True,
+        connect_args={
+            "statement_cache_size": settings.POSTGRES.STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.POSTGRES.PREPARED_STATEMENT_CACHE_SIZE,
+            "command_timeout": settings.POSTGRES.COMMAND_TIMEOUT,
+        },
+    )
+    metrics.register(name, async_engine.pool.stats)  # type: ignore
+    if settings.SQLALCHEMY.QUERY_BUDGET is not None:
+        instrument_engine(async_engine.sync_engine)
+    return async_engine
+
+
+@cache
+def get_async_engine() -> AsyncEngine:
+    return _create_async_engine(
+        settings.POSTGRES.ASYNC_DATABASE_URI, name="postgres_pool"  # type: ignore
+    )
+
+
+@cache
+def get_replica_router() -> ReplicaRouter:
+    replica_router = ReplicaRouter(
+        engines=[
+            _create_async_engine(url, name=f"postgres_replica_{i}_pool")
+            for i, url in enumerate(settings.POSTGRES.ASYNC_REPLICA_URIS)
+        ],
+        max_lag=settings.POSTGRES.REPLICA_MAX_LAG,
+        check_interval=settings.POSTGRES.REPLICA_LAG_CHECK_INTERVAL,
+    )
+    metrics.register("postgres_replicas", replica_router.stats)
+    return replica_router
+
+
+class RoutingSession(Session):
+    """
+    Session that reads from the replica engine in `info["replica"]`, if any, and writes to
+    the primary. Once it has written, reads go to the primary too so they see the writes.
+    """
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kwargs: Any) -> Any:
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info["wrote"] = True
+
+        replica = self.info.get("replica")
+        if replica is None or self.info.get("wrote"):
+            return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        return replica.sync_engine
+
+
+@cache
+def get_async_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(
+        get_async_engine(), sync_session_class=RoutingSession, expire_on_commit=False
+    )
+
+
+def async_session() -> AsyncSession:
+    return get_async_sessionmaker()()
+
+
+async def async_readonly_session() -> AsyncSession:
+    """
+    Session reading from a replica within the allowed lag, from the primary when there is
+    none. Writes still go to the primary.
+    """
+    replica = get_replica_router().choose()
+    return get_async_sessionmaker()(info={"replica": replica} if replica is not None else None)
+
+
+@cache
+def get_engine() -> Engine:
+    return create_engine(
+        settings.POSTGRES.DATABASE_URI,  # type: ignore
+        echo=settings.SQLALCHEMY.ECHO,
+        pool_recycle=settings.SQLALCHEMY.POOL_RECYCLE,
+        pool_pre_ping=True,
+        future=True,
+    )
+
+
+@cache
+def get_sessionmaker() -> "sessionmaker[Session]":
+    return sessionmaker(get_engine(), autocommit=False, autoflush=False)
+
+
+def session() -> Session:
+    return get_sessionmaker()()
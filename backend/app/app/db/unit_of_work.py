@@ -0,0 +1,55 @@
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Repositories only flush, the writes of a session make up one transaction that is committed
+# once: by `UnitOfWorkRoute` before a response is sent, by `unit_of_work` everywhere else
+
+_AFTER_COMMIT = "after_commit"
+
+
+def after_commit(db: AsyncSession, callback: Callable[[], Awaitable[Any]]) -> None:
+    """
+    Run `callback` once the current transaction of `db` is committed with `commit`,
+    e.g. to invalidate caches only when the new data is visible to other sessions.
+    """
+    db.info.setdefault(_AFTER_COMMIT, []).append(callback)
+
+
+async def commit(db: AsyncSession) -> None:
+    await db.commit()
+    for callback in db.info.pop(_AFTER_COMMIT, []):
+        await callback()
+
+
+async def rollback(db: AsyncSession) -> None:
+    db.info.pop(_AFTER_COMMIT, None)
+    await db.rollback()
+
+
+@asynccontextmanager
+async def unit_of_work(db: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """
+    Group the writes made in the block. Outside of a transaction the block is the
+    transaction, committed when it exits cleanly. Inside one it is a savepoint, rolled back
+    on error without aborting the enclosing transaction.
+    """
+    if db.in_transaction():
+        callbacks = db.info.setdefault(_AFTER_COMMIT, [])
+        registered = len(callbacks)
+        try:
+            async with db.begin_nested():
+                yield db
+        except BaseException:
+            # The writes of the savepoint are gone, so are their callbacks
+            del callbacks[registered:]
+            raise
+        return
+
+    try:
+        yield db
+    except BaseException:
+        await rollback(db)
+        raise
+    await commit(db)
@@ -0,0 +1,54 @@
+"""
+Report per-module import cost of a process entrypoint.
+
+Usage: python -m app.import_profile [module ...] [--top N]
+"""
+import argparse
+import subprocess  # nosec
+import sys
+import time
+
+DEFAULT_MODULES = ["app.main", "app.worker"]
+
+
+def profile_module(module: str) -> tuple[float, list[tuple[int, int, str]]]:
+    start = time.perf_counter()
+    process = subprocess.run(  # nosec
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed = time.perf_counter() - start
+
+    rows = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            continue
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return elapsed, rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        elapsed, rows = profile_module(module)
+        total_us = sum(self_us for self_us, _, _ in rows)
+        print(f"{module}: {elapsed * 1000:.0f} ms process, {total_us / 1000:.0f} ms imports")
+        print(f"{'self ms':>10} {'cumulative ms':>14}  module")
+        for self_us, cumulative_us, name in sorted(rows, key=lambda row: row[1], reverse=True)[
+            : args.top
+        ]:
+            print(f"{self_us / 1000:>10.1f} {cumulative_us / 1000:>14.1f}  {name}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
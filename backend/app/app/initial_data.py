@@ -6,14 +6,14 @@ from loguru import logger
 from app.custom_logging import CustomizeLogger
 from app.db.init_db import init_db
 from app.db.session import async_session
+from app.db.unit_of_work import unit_of_work
 
 CustomizeLogger.make_logger(Path(__file__).with_name("api_logging.json"))
 
 
 async def init() -> None:
-    async with async_session() as session:
+    async with async_session() as session, unit_of_work(session):
         await init_db(session)
-    await session.commit()
 
 
 def main() -> None:
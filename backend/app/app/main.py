@@ -1,40 +1,50 @@
+import asyncio
+from contextlib import suppress
 from functools import partial
 from pathlib import Path
 
 import redis.asyncio as redis
-import sentry_sdk
 from fastapi import FastAPI, Request, status
 from fastapi.exceptions import HTTPException, RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from sentry_sdk.integrations.asgi import SentryAsgiMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 
+from app import usecase
 from app.api.api_v0.api import api_router as api_router_v0
+from app.api.responses import FastJSONResponse
+from app.core.metrics import metrics
+from app.core.security import password_hasher
 from app.core.settings import settings
 from app.custom_logging import CustomizeLogger
+from app.db.redis_pool import create_redis_pool
+from app.db.session import get_replica_router
+from app.middleware import CompressionMiddleware, QueryBudgetMiddleware
 from app.schemas.response import Error, ErrorResponse, Status, ValidationErrorResponse
 from app.signals import *  # noqa # pylint: disable=wildcard-import
 from app.utils.errors import ErrException
 
-if settings.SENTRY.DSN is not None:
-    sentry_sdk.init(settings.SENTRY.DSN, environment=settings.SENTRY.ENVIRONMENT)
-
 
 async def startup(app: FastAPI) -> None:  # pylint: disable=unused-argument
-    app.state.connection = await redis.Redis(
-        host=settings.REDIS.HOST,
-        port=settings.REDIS.PORT,
-        db=settings.REDIS.DB,
-        decode_responses=True,
-    )
+    connection_pool = create_redis_pool()
+    metrics.register("redis_pool", connection_pool.stats)
+    app.state.connection = await redis.Redis(connection_pool=connection_pool)
 
     if not await app.state.connection.ping():
         raise RuntimeError("Can not connect to redis server")
 
+    app.state.user_cache_listener = asyncio.create_task(
+        usecase.user.listen_cache_invalidation(connection=app.state.connection)
+    )
+    app.state.replica_lag_probe = asyncio.create_task(get_replica_router().run())
+
 
 async def shutdown(app: FastAPI) -> None:  # pylint: disable=unused-argument
-    await app.state.connection.close()
+    for task in (app.state.user_cache_listener, app.state.replica_lag_probe):
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await app.state.connection.close(close_connection_pool=True)
+    password_hasher.shutdown()
 
 
 def create_app() -> FastAPI:
@@ -45,6 +55,7 @@ def create_app() -> FastAPI:
         docs_url=f"{settings.APP.PREFIX}/docs",
         redoc_url=f"{settings.APP.PREFIX}/redoc",
         swagger_ui_oauth2_redirect_url=f"{settings.APP.PREFIX}/docs/oauth2-redirect",
+        default_response_class=FastJSONResponse,
     )
     logger = CustomizeLogger.make_logger(Path(__file__).with_name("api_logging.json"))
     app.logger = logger  # type: ignore
@@ -55,17 +66,34 @@ app = create_app()
 
 app.add_event_handler(event_type="startup", func=partial(startup, app=app))
 app.add_event_handler(event_type="shutdown", func=partial(shutdown, app=app))
-app.add_middleware(SentryAsgiMiddleware)
+if settings.SENTRY.DSN is not None:
+    # Sentry is only imported when it is configured
+    import sentry_sdk  # pylint: disable=import-outside-toplevel
+    from sentry_sdk.integrations.asgi import (  # pylint: disable=import-outside-toplevel
+        SentryAsgiMiddleware,
+    )
+
+    sentry_sdk.init(settings.SENTRY.DSN, environment=settings.SENTRY.ENVIRONMENT)
+    app.add_middleware(SentryAsgiMiddleware)
+
 app.add_middleware(SessionMiddleware, secret_key=settings.APP.SECRET_KEY, https_only=True)
+if settings.SQLALCHEMY.QUERY_BUDGET is not None:
+    app.add_middleware(QueryBudgetMiddleware, budget=settings.SQLALCHEMY.QUERY_BUDGET)
+if settings.COMPRESSION.ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION.MINIMUM_SIZE,
+        level=settings.COMPRESSION.LEVEL,
+    )
 
 
 async def validation_exception_handler(  # pylint: disable=unused-argument
     request: Request,
     exc: RequestValidationError,
-) -> JSONResponse:
+) -> FastJSONResponse:
     # Exception
     # Override request validation exceptions
-    return JSONResponse(
+    return FastJSONResponse(
         content=ValidationErrorResponse(
             status=Status.error,
             error=Error(code=status.HTTP_400_BAD_REQUEST, message=exc.errors()),
@@ -81,8 +109,8 @@ app.add_exception_handler(RequestValidationError, validation_exception_handler)
 # Override the HTTPException error handler
 async def http_exception_handler(  # pylint: disable=unused-argument
     request: Request, exc: HTTPException
-) -> JSONResponse:
-    return JSONResponse(
+) -> FastJSONResponse:
+    return FastJSONResponse(
         content=ErrorResponse(
             status=Status.error,
             error=Error(code=exc.status_code, message=str(exc.detail)),
@@ -97,8 +125,8 @@ app.add_exception_handler(HTTPException, http_exception_handler)
 
 async def error_exception_handler(
     request: Request, exc: ErrException  # pylint: disable=unused-argument
-) -> JSONResponse:
-    return JSONResponse(
+) -> FastJSONResponse:
+    return FastJSONResponse(
         content=ErrorResponse(
             status=Status.error,
             error=Error(code=exc.status_code, message=str(exc.msg)),
@@ -0,0 +1,2 @@
+from .compression import *
+from .query_budget import *
@@ -0,0 +1,133 @@
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+__all__ = ["CompressionMiddleware"]
+
+_COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "text/",
+)
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    qualities = {}
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.partition(";")
+        try:
+            qualities[name.strip().lower()] = float(params.strip().removeprefix("q=") or 1)
+        except ValueError:
+            continue
+    return qualities.get("gzip", qualities.get("*", 0)) > 0
+
+
+class _GzipResponder:
+    """
+    Compresses one response. Body chunks are held back until `minimum_size` bytes have
+    arrived: a response that ends before is sent as it is, otherwise the held chunks and every
+    chunk after them are compressed and flushed as they come, so streamed responses are never
+    buffered whole.
+    """
+
+    def __init__(self, send: Send, minimum_size: int, level: int) -> None:
+        self.send = send
+        self.minimum_size = minimum_size
+        self.level = level
+        self.start: Message | None = None
+        self.pending: list[bytes] = []
+        self.compressor: "zlib._Compress | None" = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] < 200
+                or message["status"] in (204, 304)
+                or not content_type.startswith(_COMPRESSIBLE_TYPES)
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                self.start = message
+            return
+
+        if self.passthrough or message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+        if self.compressor is not None:
+            await self._send_compressed(body, more_body)
+            return
+
+        self.pending.append(body)
+        # Only chunks adding up to less than `minimum_size` are ever held
+        if sum(map(len, self.pending)) < self.minimum_size:
+            if more_body:
+                return
+            await self._send_uncompressed()
+            return
+
+        self.compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        assert self.start is not None  # nosec
+        headers = MutableHeaders(scope=self.start)
+        headers["Content-Encoding"] = "gzip"
+        headers.add_vary_header("Accept-Encoding")
+        if more_body:
+            del headers["Content-Length"]
+            await self.send(self.start)
+            await self._send_compressed(b"".join(self.pending), more_body=True)
+        else:
+            compressed = self.compressor.compress(b"".join(self.pending))
+            compressed += self.compressor.flush()
+            headers["Content-Length"] = str(len(compressed))
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": compressed})
+        self.pending.clear()
+
+    async def _send_uncompressed(self) -> None:
+        assert self.start is not None  # nosec
+        await self.send(self.start)
+        await self.send({"type": "http.response.body", "body": b"".join(self.pending)})
+        self.pending.clear()
+
+    async def _send_compressed(self, body: bytes, more_body: bool) -> None:
+        assert self.compressor is not None  # nosec
+        compressed = self.compressor.compress(body)
+        # Flush every chunk so streamed rows reach the client as they are produced
+        compressed += self.compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+        await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+
+class CompressionMiddleware:
+    """
+    Gzip responses for clients accepting it, compressing chunk by chunk as the body streams.
+    Responses under `minimum_size`, already encoded or of a type that doesn't compress well
+    are sent unchanged.
+    **Parameters**
+    * `app`: The ASGI application
+    * `minimum_size`: Smallest body in bytes worth compressing
+    * `level`: zlib compression level, from 1 (fastest) to 9 (smallest)
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, level: int = 6) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not _accepts_gzip(
+            Headers(scope=scope).get("accept-encoding", "")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        responder = _GzipResponder(send, minimum_size=self.minimum_size, level=self.level)
+        await self.app(scope, receive, responder)
@@ -0,0 +1,34 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.db.query_counter import count_queries
+
+__all__ = ["QueryBudgetMiddleware"]
+
+
+class QueryBudgetMiddleware:
+    """
+    Counts the SQL statements of every request, reports them in the `X-Query-Count` header
+    and fails the request once it goes over `budget`, to catch N+1 queries in development.
+    **Parameters**
+    * `app`: The ASGI application
+    * `budget`: Statements allowed per request
+    """
+
+    def __init__(self, app: ASGIApp, budget: int) -> None:
+        self.app = app
+        self.budget = budget
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with count_queries(budget=self.budget) as counter:
+
+            async def send_with_count(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    MutableHeaders(scope=message).append("X-Query-Count", str(counter.count))
+                await send(message)
+
+            await self.app(scope, receive, send_with_count)
@@ -3,7 +3,8 @@ from __future__ import annotations
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import Computed, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
@@ -15,11 +16,36 @@ if TYPE_CHECKING:
 
 __all__ = ["Item"]
 
+# Text search configuration of `Item.search_vector`, queries must use the same one
+SEARCH_CONFIG = "english"
+
 
 class Item(Base):
+    __table_args__ = (
+        # Serves the owner filter and the id ordering/keyset of the owner's item pages
+        Index("ix_item_owner_id_id", "owner_id", "id"),
+        Index("ix_item_search_vector", "search_vector", postgresql_using="gin"),
+        # Fuzzy title matching with the pg_trgm `%` operator
+        Index(
+            "ix_item_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     title: Mapped[str | None] = mapped_column(index=True)
-    description: Mapped[str | None] = mapped_column(index=True)
+    description: Mapped[str | None] = mapped_column()
+    search_vector: Mapped[str | None] = mapped_column(
+        TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector({SEARCH_CONFIG!r}, coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector({SEARCH_CONFIG!r}, coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+        deferred=True,
+    )
     owner_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
     owner: Mapped[User] = relationship(back_populates="items", lazy="select")
     created_at: Mapped[datetime] = mapped_column(
@@ -1,12 +1,17 @@
-from typing import Any, Generic, Sequence, Type, TypeVar
+import json
+from datetime import datetime
+from functools import cached_property
+from typing import Any, AsyncIterator, cast, Generic, Sequence, Type, TypeVar
 
-from sqlalchemy import delete, func
+from sqlalchemy import ColumnElement, delete, func, insert, inspect, Table, text, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm.util import identity_key
 from sqlalchemy.sql import Select
+from sqlalchemy.sql.base import ExecutableOption
+from sqlalchemy.sql.schema import ColumnElementColumnDefault, ScalarElementColumnDefault
 
 from app.db.base_class import Base
-from app.utils.encoders import jsonable_encoder_sqlalchemy
 
 ModelType = TypeVar("ModelType", bound=Base)
 
@@ -14,67 +19,344 @@ ModelType = TypeVar("ModelType", bound=Base)
 class PgRepositoryBase(Generic[ModelType]):
     """
     CRUD object with default methods to Create, Read, Update, Delete (CRUD).
+    Writes are only flushed, committing is left to the unit of work (`app.db.unit_of_work`).
     **Parameters**
     * `model`: A SQLAlchemy model class
+    * `options`: Loader options (`selectinload`, `joinedload`, `raiseload`, ...) applied to
+      every read unless a call passes its own `options`
     """
 
-    def __init__(self, model: Type[ModelType]):
+    def __init__(self, model: Type[ModelType], options: Sequence[ExecutableOption] = ()):
         self.model = model
+        self.options = tuple(options)
+
+    @cached_property
+    def columns(self) -> frozenset[str]:
+        """
+        Attribute names of the mapped columns, the fields an update can set.
+        """
+        return frozenset(attr.key for attr in inspect(self.model, raiseerr=True).column_attrs)
+
+    def _select(self, options: Sequence[ExecutableOption] | None = None) -> Select:
+        return select(self.model).options(*(self.options if options is None else options))
 
     async def get(
-        self, db: AsyncSession, id: int  # pylint: disable=redefined-builtin
+        self,
+        db: AsyncSession,
+        id: int,  # pylint: disable=redefined-builtin
+        options: Sequence[ExecutableOption] | None = None,
     ) -> ModelType | None:
-        q = await db.execute(select(self.model).where(self.model.id == id))
+        q = await db.execute(self._select(options).where(self.model.id == id))
         return q.scalars().one_or_none()
 
-    async def get_all(self, db: AsyncSession) -> Sequence[ModelType]:
-        statement = select(self.model).order_by(self.model.id)
+    async def get_by_ids(
+        self,
+        db: AsyncSession,
+        ids: Sequence[int],
+        options: Sequence[ExecutableOption] | None = None,
+    ) -> Sequence[ModelType]:
+        q = await db.execute(self._select(options).where(self.model.id.in_(ids)))
+        return q.scalars().all()
+
+    async def get_all(
+        self, db: AsyncSession, options: Sequence[ExecutableOption] | None = None
+    ) -> Sequence[ModelType]:
+        statement = self._select(options).order_by(self.model.id)
         q = await db.execute(statement)
         return q.scalars().all()
 
-    async def create(self, db: AsyncSession, *, db_obj: ModelType) -> ModelType:
+    async def stream(
+        self,
+        db: AsyncSession,
+        statement: Select | None = None,
+        *,
+        batch_size: int = 1000,
+        options: Sequence[ExecutableOption] | None = None,
+    ) -> AsyncIterator[Sequence[ModelType]]:
+        """
+        Stream the rows of `statement` (the whole table by default, ordered by id) in batches
+        of `batch_size` from a server-side cursor, memory stays bounded by one batch.
+        """
+        if statement is None:
+            statement = select(self.model).order_by(self.model.id)
+        result = await db.stream_scalars(
+            statement.options(*(self.options if options is None else options)).execution_options(
+                yield_per=batch_size
+            )
+        )
+        async for batch in result.partitions():
+            yield batch
+
+    async def refresh(
+        self,
+        db: AsyncSession,
+        db_obj: ModelType,
+        options: Sequence[ExecutableOption] | None = None,
+    ) -> ModelType:
+        """
+        Reload `db_obj` from the database together with the relationships its loader options
+        cover, so they can be serialized without a lazy load.
+        """
+        if not (self.options if options is None else options):
+            await db.refresh(db_obj)
+            return db_obj
+
+        q = await db.execute(
+            self._select(options)
+            .where(self.model.id == db_obj.id)
+            .execution_options(populate_existing=True)
+        )
+        return q.scalars().one()
+
+    async def create(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: ModelType,
+        options: Sequence[ExecutableOption] | None = None,
+    ) -> ModelType:
         db.add(db_obj)
-        await db.commit()
-        await db.refresh(db_obj)
-        return db_obj
+        await db.flush()
+        return await self.refresh(db, db_obj, options=options)
+
+    async def create_many(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[dict[str, Any]],
+        options: Sequence[ExecutableOption] | None = None,
+    ) -> Sequence[ModelType]:
+        """
+        Insert `objs_in` with multi-row `INSERT ... RETURNING` statements (split in pages of
+        the engine's `insertmanyvalues_page_size`).
+        """
+        if not objs_in:
+            return []
+
+        q = await db.execute(
+            insert(self.model)
+            .returning(self.model)
+            .options(*(self.options if options is None else options)),
+            objs_in,
+        )
+        return q.scalars().all()
+
+    async def copy_many(self, db: AsyncSession, *, objs_in: Sequence[dict[str, Any]]) -> int:
+        """
+        Insert `objs_in` with `COPY` on asyncpg, an executemany `INSERT` on other drivers.
+        Nothing is returned but the number of rows. Column defaults are evaluated once for
+        the whole batch, like `now()` is within a transaction.
+        """
+        if not objs_in:
+            return 0
+
+        # COPY bypasses the ORM, mark the session as written for the replica routing
+        db.info["wrote"] = True
+        connection = await db.connection()
+        if connection.dialect.driver != "asyncpg":
+            await db.execute(insert(self.model), objs_in)
+            return len(objs_in)
+
+        table = cast(Table, self.model.__table__)
+        defaults: dict[str, Any] = {}
+        for column in table.columns:
+            if column.key in objs_in[0]:
+                continue
+            if isinstance(column.default, ScalarElementColumnDefault):
+                defaults[column.key] = column.default.arg
+            elif isinstance(column.default, ColumnElementColumnDefault):
+                defaults[column.key] = await db.scalar(select(column.default.arg))
+
+        columns = [
+            column for column in table.columns if column.key in objs_in[0] or column.key in defaults
+        ]
+        processors = [column.type.bind_processor(connection.dialect) for column in columns]
+        records = [
+            tuple(
+                processor(value) if processor is not None else value
+                for processor, value in zip(
+                    processors,
+                    (obj_in.get(c.key, defaults.get(c.key)) for c in columns),
+                    strict=True,
+                )
+            )
+            for obj_in in objs_in
+        ]
+
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(  # type: ignore
+            table.name,
+            records=records,
+            columns=[column.name for column in columns],
+            schema_name=table.schema,
+        )
+        return len(records)
 
     async def delete(self, db: AsyncSession, *, db_obj: ModelType) -> ModelType:
         await db.delete(db_obj)
-        await db.commit()
+        await db.flush()
         return db_obj
 
     async def delete_by_id(
         self, db: AsyncSession, *, id: int  # pylint: disable=redefined-builtin
     ) -> None:
         await db.execute(delete(self.model).where(self.model.id == id))  # type: ignore
-        await db.commit()
 
     async def delete_all(self, db: AsyncSession) -> None:
         await db.execute(delete(self.model))  # type: ignore
-        await db.commit()
 
     async def update(
-        self, db: AsyncSession, *, db_obj: ModelType, update_data: dict[str, Any]
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: ModelType,
+        update_data: dict[str, Any],
+        options: Sequence[ExecutableOption] | None = None,
     ) -> ModelType:
-        obj_data = jsonable_encoder_sqlalchemy(db_obj)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
+        for field, value in update_data.items():
+            if field in self.columns:
+                setattr(db_obj, field, value)
         db.add(db_obj)
-        await db.commit()
-        await db.refresh(db_obj)
-        return db_obj
+        await db.flush()
+        return await self.refresh(db, db_obj, options=options)
+
+    async def update_by_id(  # pylint: disable=too-many-arguments
+        self,
+        db: AsyncSession,
+        *,
+        id: int,  # pylint: disable=redefined-builtin
+        update_data: dict[str, Any],
+        updated_at: datetime | None = None,
+        criteria: Sequence[ColumnElement[bool]] = (),
+        options: Sequence[ExecutableOption] | None = None,
+    ) -> ModelType | None:
+        """
+        Update a row with a single `UPDATE ... WHERE id = ... RETURNING` without loading it.
+        With `updated_at` the row is only updated if it wasn't modified since (optimistic
+        concurrency). Returns None when no row matched `id`, `updated_at` and `criteria`.
+        An instance of the row already in the session is expired, pending changes included,
+        and refreshed from the returned row.
+        """
+        # RETURNING doesn't overwrite the loaded attributes of an instance in the identity map
+        instance = db.identity_map.get(identity_key(self.model, id))
+        if instance is not None:
+            db.expire(instance)
+
+        statement = update(self.model).where(self.model.id == id, *criteria)
+        if updated_at is not None:
+            statement = statement.where(self.model.__table__.c.updated_at == updated_at)
+
+        q = await db.execute(
+            statement.values(
+                {
+                    field: value
+                    for field, value in update_data.items()
+                    if field in self.columns and field != "id"
+                }
+            )
+            .returning(self.model)
+            .options(*(self.options if options is None else options))
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        return q.scalars().one_or_none()
 
     async def get_multi(
-        self, db: AsyncSession, *, offset: int = 0, limit: int = 100
+        self,
+        db: AsyncSession,
+        *,
+        offset: int = 0,
+        limit: int = 100,
+        options: Sequence[ExecutableOption] | None = None,
     ) -> Sequence[ModelType]:
-        statement = select(self.model).offset(offset).limit(limit).order_by(self.model.id)
+        statement = self._select(options).offset(offset).limit(limit).order_by(self.model.id)
         q = await db.execute(statement)
         return q.scalars().all()
 
+    async def paginate(
+        self,
+        db: AsyncSession,
+        statement: Select,
+        *,
+        order_by: Sequence[str] = ("id",),
+        after: Sequence[Any] | None = None,
+        offset: int = 0,
+        limit: int = 100,
+        options: Sequence[ExecutableOption] | None = None,
+    ) -> tuple[Sequence[ModelType], list[Any] | None]:
+        """
+        Keyset pagination over `order_by` (ascending, should end with a unique column).
+        Rows after the sort key `after` are returned without scanning the skipped ones,
+        `offset` is only applied when there is no `after`. Also returns the sort key of
+        the last row when another page follows.
+        """
+        if limit < 1:
+            return [], None
+
+        columns = [getattr(self.model, name) for name in order_by]
+        statement = statement.options(*(self.options if options is None else options))
+        if after is not None:
+            statement = statement.where(tuple_(*columns) > tuple_(*after))
+        elif offset:
+            statement = statement.offset(offset)
+
+        q = await db.execute(statement.order_by(*columns).limit(limit + 1))
+        objs = q.scalars().all()
+        if len(objs) <= limit:
+            return objs, None
+
+        objs = objs[:limit]
+        return objs, [getattr(objs[-1], name) for name in order_by]
+
+    async def get_page(
+        self,
+        db: AsyncSession,
+        *,
+        order_by: Sequence[str] = ("id",),
+        after: Sequence[Any] | None = None,
+        offset: int = 0,
+        limit: int = 100,
+        options: Sequence[ExecutableOption] | None = None,
+    ) -> tuple[Sequence[ModelType], list[Any] | None]:
+        return await self.paginate(
+            db,
+            select(self.model),
+            order_by=order_by,
+            after=after,
+            offset=offset,
+            limit=limit,
+            options=options,
+        )
+
     async def count(self, db: AsyncSession, query: Select) -> int:
         return await db.scalar(
             select(func.count()).select_from(  # pylint: disable=not-callable
                 query.with_only_columns(self.model.id).subquery()  # type: ignore
             )
         )
+
+    async def count_estimated(self, db: AsyncSession, query: Select) -> int:
+        """
+        Planner row estimate instead of a scan: `pg_class.reltuples` for the whole table,
+        the `EXPLAIN` estimate for filtered queries.
+        """
+        dialect = db.get_bind().dialect
+        if query.whereclause is None:
+            reltuples = await db.scalar(
+                text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+                {"table": dialect.identifier_preparer.format_table(self.model.__table__)},
+            )
+            # reltuples is -1 until the table has been vacuumed or analyzed
+            if reltuples is not None and reltuples >= 0:
+                return reltuples
+
+        compiled = query.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+        plan = await db.scalar(text(f"EXPLAIN (FORMAT JSON) {compiled}"))  # nosec
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    async def count_all(self, db: AsyncSession, *, estimated: bool = False) -> int:
+        query = select(self.model)
+        if estimated:
+            return await self.count_estimated(db, query)
+        return await self.count(db, query)
@@ -1,9 +1,14 @@
-from typing import Sequence
+from typing import Any, AsyncIterator, Sequence
 
+from sqlalchemy import cast, func, or_, tuple_
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.sql.base import ExecutableOption
 
 from app.models import Item
+from app.models.item import SEARCH_CONFIG
 from app.pg_repository.base import PgRepositoryBase
 
 
@@ -15,9 +20,10 @@ class PgRepositoryItem(PgRepositoryBase[Item]):
         owner_id: int,
         offset: int = 0,
         limit: int = 100,
+        options: Sequence[ExecutableOption] | None = None,
     ) -> Sequence[Item]:
         q = await db.execute(
-            select(self.model)
+            self._select(options)
             .where(self.model.owner_id == owner_id)
             .offset(offset)
             .limit(limit)
@@ -25,5 +31,97 @@ class PgRepositoryItem(PgRepositoryBase[Item]):
         )
         return q.scalars().all()
 
+    async def get_ids_by_owner(self, db: AsyncSession, *, owner_id: int) -> Sequence[int]:
+        q = await db.execute(select(self.model.id).where(self.model.owner_id == owner_id))
+        return q.scalars().all()
+
+    async def get_page_by_owner(
+        self,
+        db: AsyncSession,
+        *,
+        owner_id: int,
+        order_by: Sequence[str] = ("id",),
+        after: Sequence[Any] | None = None,
+        offset: int = 0,
+        limit: int = 100,
+        options: Sequence[ExecutableOption] | None = None,
+    ) -> tuple[Sequence[Item], list[Any] | None]:
+        query = select(self.model).where(self.model.owner_id == owner_id)
+        return await self.paginate(
+            db, query, order_by=order_by, after=after, offset=offset, limit=limit, options=options
+        )
+
+    def stream_by_owner(
+        self,
+        db: AsyncSession,
+        *,
+        owner_id: int,
+        batch_size: int = 1000,
+        options: Sequence[ExecutableOption] | None = None,
+    ) -> AsyncIterator[Sequence[Item]]:
+        return self.stream(
+            db,
+            select(self.model).where(self.model.owner_id == owner_id).order_by(self.model.id),
+            batch_size=batch_size,
+            options=options,
+        )
+
+    async def search(  # pylint: disable=too-many-arguments
+        self,
+        db: AsyncSession,
+        *,
+        query: str,
+        owner_id: int | None = None,
+        after: Sequence[Any] | None = None,
+        limit: int = 100,
+        options: Sequence[ExecutableOption] | None = None,
+    ) -> tuple[Sequence[Item], list[Any] | None]:
+        """
+        Items matching `query` in their full-text `search_vector` or fuzzily (pg_trgm) in
+        their title, best first. Keyset paginated on (score, id) descending, returns the
+        sort key of the last row when another page follows.
+        """
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        # Cast so the score survives the round trip through the cursor exactly. The similarity
+        # of a null title is null, it would make the score null: sorted first and unusable
+        # as a keyset
+        score = cast(
+            func.ts_rank_cd(self.model.search_vector, ts_query)
+            + func.coalesce(  # pylint: disable=not-callable
+                func.similarity(self.model.title, query), 0
+            ),
+            DOUBLE_PRECISION,
+        )
+        statement = select(self.model, score.label("score")).where(
+            or_(
+                self.model.search_vector.bool_op("@@")(ts_query),
+                self.model.title.bool_op("%")(query),
+            )
+        )
+        if owner_id is not None:
+            statement = statement.where(self.model.owner_id == owner_id)
+        if after is not None:
+            statement = statement.where(tuple_(score, self.model.id) < tuple_(*after))
+
+        q = await db.execute(
+            statement.options(*(self.options if options is None else options))
+            .order_by(score.desc(), self.model.id.desc())
+            .limit(limit + 1)
+        )
+        rows = q.all()
+        objs = [obj for obj, _ in rows[:limit]]
+        if len(rows) <= limit:
+            return objs, None
+        return objs, [rows[limit - 1].score, objs[-1].id]
+
+    async def count_by_owner(
+        self, db: AsyncSession, *, owner_id: int, estimated: bool = False
+    ) -> int:
+        query = select(self.model).where(self.model.owner_id == owner_id)
+        if estimated:
+            return await self.count_estimated(db, query)
+        return await self.count(db, query)
+
 
-item = PgRepositoryItem(Item)
+# Every item response serializes its owner, one extra SELECT ... IN loads them for a whole page
+item = PgRepositoryItem(Item, options=(selectinload(Item.owner),))
@@ -4,6 +4,7 @@ from sqlalchemy import exc
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
+from app.db.unit_of_work import unit_of_work
 from app.models import User
 from app.pg_repository.base import PgRepositoryBase
 
@@ -21,11 +22,12 @@ class PgRepositoryUser(PgRepositoryBase[User]):
             return obj, False
 
         try:
-            obj = self.model(email=email, **kwargs)  # type: ignore
-            obj = await self.create(db=db, db_obj=obj)
+            # Savepoint, a concurrent insert of the same email only rolls back this insert
+            async with unit_of_work(db):
+                obj = self.model(email=email, **kwargs)  # type: ignore
+                obj = await self.create(db=db, db_obj=obj)
             return obj, True
         except exc.IntegrityError:
-            await db.rollback()
             q = await db.execute(select(self.model).where(self.model.email == email))
             obj = q.scalars().one()
             return obj, False
@@ -0,0 +1,240 @@
+"""
+Check the query plans of the repository methods against a seeded database.
+
+Seeds users and items in a transaction that is rolled back at the end, runs every checked
+repository read with `EXPLAIN (ANALYZE, BUFFERS)` and fails when a statement scans a table
+sequentially, misses its expected index or visits more rows than its budget.
+
+Usage: python -m app.query_plans [--users N] [--items N] [--verbose]
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import Any, Awaitable, Callable, Iterator, NamedTuple
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app import pg_repository
+from app.db.session import get_async_engine
+
+PAGE_SIZE = 100
+
+# `id` also has a plain index (`index=True` in the models), the planner may pick either one
+USER_ID_INDEXES = {"user_pkey", "ix_user_id"}
+ITEM_ID_INDEXES = {"item_pkey", "ix_item_id"}
+
+SEED_USERS = text(
+    """
+    INSERT INTO "user" (email, hashed_password, full_name, is_active, is_superuser,
+                        created_at, updated_at)
+    SELECT 'query-plans-' || g || '@example.com', '', 'User ' || g, true, false, now(), now()
+    FROM generate_series(1, :users) AS g
+    """
+)
+SEED_ITEMS = text(
+    """
+    INSERT INTO item (title, description, owner_id, created_at, updated_at)
+    SELECT 'Item ' || g, md5(g::text), u.id, now(), now()
+    FROM generate_series(1, :items) AS g
+    JOIN (
+        SELECT id, row_number() OVER (ORDER BY id) - 1 AS n
+        FROM "user"
+        WHERE email LIKE 'query-plans-%'
+    ) AS u ON u.n = g % :users
+    """
+)
+
+
+class Check(NamedTuple):
+    """
+    A repository call whose statements must all use indexes.
+    **Parameters**
+    * `name`: Name shown in the report
+    * `call`: Runs the repository method on the given session
+    * `indexes`: Indexes that must appear in the plans, each given as the set of index names
+      that can serve it
+    * `max_rows`: Budget of table rows visited (returned or filtered out) by all statements
+    """
+
+    name: str
+    call: Callable[[AsyncSession], Awaitable[Any]]
+    indexes: tuple[set[str], ...]
+    max_rows: int
+
+
+def walk(plan: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+
+def rows_visited(node: dict[str, Any]) -> float:
+    if "Relation Name" not in node:
+        return 0
+    loops = node.get("Actual Loops", 1)
+    return loops * (
+        node.get("Actual Rows", 0)
+        + node.get("Rows Removed by Filter", 0)
+        + node.get("Rows Removed by Index Recheck", 0)
+    )
+
+
+async def capture(
+    connection: AsyncConnection, session: AsyncSession, check: Check
+) -> list[tuple[str, Any]]:
+    statements: list[tuple[str, Any]] = []
+
+    def before_cursor_execute(  # pylint: disable=too-many-arguments,unused-argument
+        conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+    ) -> None:
+        statements.append((statement, parameters))
+
+    sync_engine = connection.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        await check.call(session)
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+async def explain(connection: AsyncConnection, statement: str, parameters: Any) -> dict:
+    result = await connection.exec_driver_sql(
+        f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters  # nosec
+    )
+    plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+async def run_check(
+    connection: AsyncConnection, session: AsyncSession, check: Check, verbose: bool
+) -> list[str]:
+    failures = []
+    used_indexes: set[str] = set()
+    visited = 0.0
+    for statement, parameters in await capture(connection, session, check):
+        plan = await explain(connection, statement, parameters)
+        nodes = list(walk(plan))
+        failures += [
+            f"sequential scan on {node['Relation Name']}"
+            for node in nodes
+            if node["Node Type"] == "Seq Scan"
+        ]
+        used_indexes.update(node["Index Name"] for node in nodes if "Index Name" in node)
+        visited += sum(rows_visited(node) for node in nodes)
+        if verbose:
+            print(json.dumps(plan, indent=2))
+
+    missing = [
+        " or ".join(sorted(alternatives))
+        for alternatives in check.indexes
+        if not alternatives & used_indexes
+    ]
+    if missing:
+        failures.append(f"expected indexes not used: {', '.join(missing)}")
+    if visited > check.max_rows:
+        failures.append(f"visited {visited:.0f} rows, budget is {check.max_rows}")
+
+    status = "FAIL" if failures else "ok"
+    print(f"{status:>4}  {check.name}: {visited:.0f} rows, indexes {sorted(used_indexes)}")
+    for failure in failures:
+        print(f"      {failure}")
+    return failures
+
+
+def build_checks(owner_id: int, items_per_owner: int, after: list[Any]) -> list[Check]:
+    item, user = pg_repository.item, pg_repository.user
+    # A page visits its items, the look-ahead row and at most one owner row per item
+    page_rows = 2 * PAGE_SIZE + 2
+    return [
+        Check("user.get", lambda db: user.get(db, id=owner_id), (USER_ID_INDEXES,), 1),
+        Check(
+            "user.get_by_email",
+            lambda db: user.get_by_email(db, email="query-plans-1@example.com"),
+            ({"ix_user_email"},),
+            1,
+        ),
+        Check(
+            "user.get_by_ids",
+            lambda db: user.get_by_ids(db, ids=list(range(owner_id, owner_id + PAGE_SIZE))),
+            (USER_ID_INDEXES,),
+            PAGE_SIZE,
+        ),
+        Check("item.get", lambda db: item.get(db, id=after[0]), (ITEM_ID_INDEXES,), 2),
+        Check("item.get_multi", item.get_multi, (ITEM_ID_INDEXES,), page_rows),
+        Check("item.get_page", item.get_page, (ITEM_ID_INDEXES,), page_rows),
+        Check(
+            "item.get_page after",
+            lambda db: item.get_page(db, after=after),
+            (ITEM_ID_INDEXES,),
+            page_rows,
+        ),
+        Check(
+            "item.get_multi_by_owner",
+            lambda db: item.get_multi_by_owner(db, owner_id=owner_id),
+            ({"ix_item_owner_id_id"},),
+            page_rows,
+        ),
+        Check(
+            "item.get_page_by_owner after",
+            lambda db: item.get_page_by_owner(
+                db, owner_id=owner_id, after=after, limit=PAGE_SIZE // 10
+            ),
+            ({"ix_item_owner_id_id"},),
+            page_rows,
+        ),
+        Check(
+            "item.count_by_owner",
+            lambda db: item.count_by_owner(db, owner_id=owner_id),
+            ({"ix_item_owner_id_id"},),
+            2 * items_per_owner,
+        ),
+    ]
+
+
+async def run(users: int, items: int, verbose: bool) -> int:
+    failures = []
+    async with get_async_engine().connect() as connection:
+        transaction = await connection.begin()
+        try:
+            await connection.execute(SEED_USERS, {"users": users})
+            await connection.execute(SEED_ITEMS, {"users": users, "items": items})
+            await connection.execute(text('ANALYZE "user"'))
+            await connection.execute(text("ANALYZE item"))
+
+            owner_id = await connection.scalar(
+                text('SELECT id FROM "user" WHERE email = :email'),
+                {"email": f"query-plans-{users // 2}@example.com"},
+            )
+            first_item_id = await connection.scalar(
+                text("SELECT min(id) FROM item WHERE owner_id = :owner_id"),
+                {"owner_id": owner_id},
+            )
+            checks = build_checks(
+                owner_id=owner_id, items_per_owner=items // users, after=[first_item_id]
+            )
+
+            session = AsyncSession(bind=connection, join_transaction_mode="create_savepoint")
+            for check in checks:
+                failures += await run_check(connection, session, check, verbose=verbose)
+            await session.close()
+        finally:
+            await transaction.rollback()
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--items", type=int, default=200_000)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(users=args.users, items=args.items, verbose=args.verbose)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,3 @@
+from .repository_count import count
 from .repository_user import user
+from .repository_version import version
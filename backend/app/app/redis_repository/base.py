@@ -1,16 +1,151 @@
+import hashlib
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
 from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from redis.client import NEVER_DECODE
+from redis.exceptions import NoScriptError
+
+from app.redis_repository.codec import CacheCodec, JsonCodec
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class RedisRepositoryBase:  # pylint: disable=too-many-public-methods
+    """
+    Redis access with default methods for strings, sets, locks, pub/sub and lua scripts.
+    Write methods also accept the pipeline from `pipeline()` as `connection` and queue their
+    commands on it, so several of them can be sent in a single round trip.
+    **Parameters**
+    * `codec`: A CacheCodec used by `create_object` and `get_object`
+    """
+
+    def __init__(self, codec: CacheCodec | None = None) -> None:
+        self.codec = codec or JsonCodec()
+        self.scripts: dict[str, tuple[str, str]] = {}
+        self.register_script("release_lock", _RELEASE_LOCK_SCRIPT)
 
+    def register_script(self, name: str, script: str) -> None:
+        self.scripts[name] = (script, hashlib.sha1(script.encode()).hexdigest())  # nosec
 
-class RedisRepositoryBase:
-    async def create(self, connection: Redis, key: str, value: str) -> None:
-        await connection.set(key, value)
+    async def run_script(
+        self,
+        connection: Redis,
+        name: str,
+        keys: list[str],
+        args: list[Any],
+        *,
+        decode_responses: bool = True,
+    ) -> Any:
+        """
+        Run a registered script with EVALSHA, the script is only sent to redis when the
+        server doesn't know its SHA yet (first call or after a SCRIPT FLUSH/restart).
+        """
+        script, sha = self.scripts[name]
+        options = {} if decode_responses else {NEVER_DECODE: True}
+        try:
+            return await connection.execute_command(
+                "EVALSHA", sha, len(keys), *keys, *args, **options
+            )
+        except NoScriptError:
+            await connection.script_load(script)
+            return await connection.execute_command(
+                "EVALSHA", sha, len(keys), *keys, *args, **options
+            )
+
+    @asynccontextmanager
+    async def pipeline(
+        self, connection: Redis, transaction: bool = True
+    ) -> AsyncIterator[Pipeline]:
+        """
+        Buffer commands and send them in one round trip (wrapped in MULTI/EXEC when
+        `transaction`) when the block exits without error. When `connection` is already a
+        pipeline the commands are queued on it and sent with the rest of its commands.
+        """
+        if isinstance(connection, Pipeline):
+            yield connection
+            return
+        async with connection.pipeline(transaction=transaction) as pipe:
+            yield pipe
+            await pipe.execute()
+
+    async def create(self, connection: Redis, key: str, value: str, ttl: int | None = None) -> None:
+        await connection.set(key, value, ex=ttl)
 
     async def get(self, connection: Redis, key: str) -> str | None:
         return await connection.get(key)
 
+    async def create_object(
+        self,
+        connection: Redis,
+        key: str,
+        data: dict[str, Any],
+        ttl: int | None = None,
+        *,
+        nx: bool = False,
+    ) -> None:
+        await connection.set(key, self.codec.encode(data), ex=ttl, nx=nx)
+
+    async def get_object(self, connection: Redis, key: str) -> dict[str, Any] | None:
+        value = await connection.execute_command("GET", key, **{NEVER_DECODE: True})
+        if value is None:
+            return None
+        return self.codec.decode(value)
+
+    async def mget(self, connection: Redis, keys: list[str]) -> list[str | None]:
+        if not keys:
+            return []
+        return await connection.mget(keys)
+
+    async def mset_with_ttl(
+        self, connection: Redis, mapping: dict[str, str | bytes], ttl: int | None = None
+    ) -> None:
+        if not mapping:
+            return
+        async with self.pipeline(connection=connection, transaction=False) as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, value, ex=ttl)
+
+    async def create_objects(
+        self, connection: Redis, mapping: dict[str, dict[str, Any]], ttl: int | None = None
+    ) -> None:
+        await self.mset_with_ttl(
+            connection=connection,
+            mapping={key: self.codec.encode(data) for key, data in mapping.items()},
+            ttl=ttl,
+        )
+
+    async def get_objects(self, connection: Redis, keys: list[str]) -> list[dict[str, Any] | None]:
+        if not keys:
+            return []
+        values = await connection.execute_command("MGET", *keys, **{NEVER_DECODE: True})
+        return [None if value is None else self.codec.decode(value) for value in values]
+
     async def delete(self, connection: Redis, key: str) -> None:
         await connection.delete(key)
 
+    async def delete_many(self, connection: Redis, keys: list[str]) -> None:
+        if keys:
+            await connection.delete(*keys)
+
+    async def hash_get(self, connection: Redis, key: str, field: str) -> str | None:
+        return await connection.hget(key, field)
+
+    async def hash_set(
+        self, connection: Redis, key: str, field: str, value: str, *, ttl: int | None = None
+    ) -> None:
+        async with self.pipeline(connection=connection) as pipe:
+            pipe.hset(key, field, value)
+            if ttl is not None:
+                pipe.expire(key, ttl)
+
     async def set_add(self, connection: Redis, key: str, value: str) -> None:
         await connection.sadd(key, value)
 
@@ -22,3 +157,54 @@ class RedisRepositoryBase:
 
     async def set_delete(self, connection: Redis, key: str, value: str) -> None:
         await connection.srem(key, value)
+
+    async def expiring_set_add(
+        self,
+        connection: Redis,
+        key: str,
+        value: str,
+        expire_at: int,
+        *,
+        max_size: int | None = None,
+    ) -> None:
+        """
+        Add a member to a sorted set scored by its unix expiry time, prune expired members,
+        keep only the `max_size` members expiring last and expire the key with the new member.
+        """
+        async with self.pipeline(connection=connection) as pipe:
+            pipe.zremrangebyscore(key, "-inf", int(time.time()))
+            pipe.zadd(key, {value: expire_at})
+            if max_size is not None:
+                pipe.zremrangebyrank(key, 0, -max_size - 1)
+            pipe.expireat(key, expire_at)
+
+    async def expiring_set_is_member(self, connection: Redis, key: str, value: str) -> bool:
+        async with connection.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(key, "-inf", int(time.time()))
+            pipe.zscore(key, value)
+            _, score = await pipe.execute()
+        return score is not None
+
+    async def expiring_set_delete(self, connection: Redis, key: str, value: str) -> None:
+        await connection.zrem(key, value)
+
+    async def acquire_lock(self, connection: Redis, key: str, token: str, ttl: int) -> bool:
+        return bool(await connection.set(key, token, ex=ttl, nx=True))
+
+    async def release_lock(self, connection: Redis, key: str, token: str) -> None:
+        await self.run_script(connection=connection, name="release_lock", keys=[key], args=[token])
+
+    async def publish(self, connection: Redis, channel: str, message: str) -> None:
+        await connection.publish(channel, message)
+
+    async def listen(self, connection: Redis, channel: str) -> AsyncIterator[str]:
+        pubsub = connection.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(channel)
+        try:
+            while True:
+                # Poll instead of blocking on the socket so idle channels don't hit socket_timeout
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None:
+                    yield message["data"]
+        finally:
+            await pubsub.reset()
@@ -0,0 +1,131 @@
+import json
+import struct
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Any, Sequence, Type
+
+from pydantic import BaseModel
+
+__all__ = ["CacheCodec", "JsonCodec", "StructCodec"]
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class CacheCodec:
+    """
+    Converts cached objects to and from the bytes stored in redis.
+    `decode` returns None for entries it can not read, callers treat them as a cache miss.
+    """
+
+    def encode(self, data: dict[str, Any]) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, value: bytes) -> dict[str, Any] | None:
+        raise NotImplementedError
+
+
+class JsonCodec(CacheCodec):
+    def __init__(self, schema: Type[BaseModel] | None = None) -> None:
+        self.schema = schema
+
+    def encode(self, data: dict[str, Any]) -> bytes:
+        if self.schema is not None:
+            return self.schema(**data).json().encode()
+        return json.dumps(data, default=str).encode()
+
+    def decode(self, value: bytes) -> dict[str, Any] | None:
+        try:
+            if self.schema is not None:
+                return self.schema.parse_raw(value).dict()
+            return json.loads(value)
+        except ValueError:
+            return None
+
+
+class StructCodec(CacheCodec):
+    """
+    Fixed field layout packed with `struct` behind a schema-version byte and a null bitmap.
+    Strings are stored as a length in the fixed part and their utf-8 bytes appended after it.
+    Entries written with another version are ignored, bump it whenever the fields change.
+    **Parameters**
+    * `fields`: Ordered `(name, type)` pairs, type is one of bool, int, float, str or datetime
+    * `version`: Schema version, from 0 to 255
+    * `tz`: Timezone of decoded datetimes
+    """
+
+    _formats = {bool: "?", int: "q", float: "d", str: "I", datetime: "q"}
+
+    def __init__(
+        self, fields: Sequence[tuple[str, type]], version: int, tz: tzinfo = timezone.utc
+    ) -> None:
+        if len(fields) > 64:
+            raise ValueError("StructCodec supports at most 64 fields")
+        self.fields = tuple(fields)
+        self.version = version
+        self.tz = tz
+        self._struct = struct.Struct(
+            "<BQ" + "".join(self._formats[field_type] for _, field_type in self.fields)
+        )
+
+    @classmethod
+    def from_schema(
+        cls, schema: Type[BaseModel], version: int, tz: tzinfo = timezone.utc
+    ) -> "StructCodec":
+        fields = []
+        for name, field in schema.__fields__.items():
+            field_type = next(
+                (
+                    t
+                    for t in cls._formats
+                    if isinstance(field.type_, type) and issubclass(field.type_, t)
+                ),
+                None,
+            )
+            if field_type is None:
+                raise TypeError(f"unsupported field type for {name}: {field.type_}")
+            fields.append((name, field_type))
+        return cls(fields, version=version, tz=tz)
+
+    def encode(self, data: dict[str, Any]) -> bytes:
+        nulls = 0
+        values: list[Any] = []
+        strings: list[bytes] = []
+        for index, (name, field_type) in enumerate(self.fields):
+            value = data.get(name)
+            if value is None:
+                nulls |= 1 << index
+                values.append(0)
+            elif field_type is str:
+                encoded = value.encode()
+                values.append(len(encoded))
+                strings.append(encoded)
+            elif field_type is datetime:
+                values.append((value - _EPOCH) // _MICROSECOND)
+            else:
+                values.append(value)
+        return self._struct.pack(self.version, nulls, *values) + b"".join(strings)
+
+    def decode(self, value: bytes) -> dict[str, Any] | None:
+        if len(value) < self._struct.size or value[0] != self.version:
+            return None
+
+        try:
+            _, nulls, *values = self._struct.unpack_from(value)
+            data: dict[str, Any] = {}
+            offset = self._struct.size
+            for index, ((name, field_type), field_value) in enumerate(
+                zip(self.fields, values, strict=True)
+            ):
+                if field_type is str:
+                    end = offset + field_value
+                    field_value = value[offset:end].decode()
+                    offset = end
+                elif field_type is datetime:
+                    field_value = (_EPOCH + field_value * _MICROSECOND).astimezone(self.tz)
+                data[name] = None if nulls & (1 << index) else field_value
+        except (struct.error, UnicodeDecodeError):
+            return None
+
+        if offset != len(value):
+            return None
+        return data
@@ -0,0 +1,37 @@
+from redis.asyncio import Redis
+
+from app.redis_repository.base import RedisRepositoryBase
+
+
+class RedisRepositoryCount(RedisRepositoryBase):
+    """
+    Row counts cached per table in one hash, with a field per filter scope,
+    so a single DEL invalidates every count of a table.
+    """
+
+    @staticmethod
+    def _generate_redis_count(table: str) -> str:
+        return f"Count:{table}"
+
+    async def get_count(self, connection: Redis, table: str, scope: str) -> int | None:
+        value = await self.hash_get(
+            connection=connection, key=self._generate_redis_count(table), field=scope
+        )
+        return None if value is None else int(value)
+
+    async def set_count(
+        self, connection: Redis, table: str, scope: str, value: int, *, ttl: int | None = None
+    ) -> None:
+        await self.hash_set(
+            connection=connection,
+            key=self._generate_redis_count(table),
+            field=scope,
+            value=str(value),
+            ttl=ttl,
+        )
+
+    async def invalidate(self, connection: Redis, table: str) -> None:
+        await self.delete(connection=connection, key=self._generate_redis_count(table))
+
+
+count = RedisRepositoryCount()
@@ -1,8 +1,69 @@
+import time
+from typing import Any
+
+import pytz
+from redis.asyncio import Redis
+
+from app.core.settings import settings
 from app.redis_repository.base import RedisRepositoryBase
+from app.redis_repository.codec import CacheCodec, StructCodec
+from app.schemas.user import UserInDB
+
+# Bump whenever UserInDB fields change so entries written by older deploys are ignored
+USER_CACHE_VERSION = 1
+
+
+# KEYS: refresh token set, user cache
+# ARGV: now, old token, new token, new token expiry, max sessions
+_ROTATE_REFRESH_TOKEN_SCRIPT = """
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", ARGV[1])
+if not redis.call("ZSCORE", KEYS[1], ARGV[2]) then
+    return {0, false}
+end
+redis.call("ZREM", KEYS[1], ARGV[2])
+redis.call("ZADD", KEYS[1], ARGV[4], ARGV[3])
+if tonumber(ARGV[5]) > 0 then
+    redis.call("ZREMRANGEBYRANK", KEYS[1], 0, -tonumber(ARGV[5]) - 1)
+end
+redis.call("EXPIREAT", KEYS[1], ARGV[4])
+return {1, redis.call("GET", KEYS[2])}
+"""
 
 
 class RedisRepositoryUser(RedisRepositoryBase):
-    pass
+    def __init__(self, codec: CacheCodec | None = None) -> None:
+        super().__init__(codec=codec)
+        self.register_script("rotate_refresh_token", _ROTATE_REFRESH_TOKEN_SCRIPT)
+
+    async def rotate_refresh_token(  # pylint: disable=too-many-arguments
+        self,
+        connection: Redis,
+        *,
+        key: str,
+        cache_key: str,
+        old_token: str,
+        new_token: str,
+        expire_at: int,
+        max_size: int,
+    ) -> tuple[bool, dict[str, Any] | None]:
+        """
+        Atomically swap `old_token` for `new_token` in the expiring set at `key` and return
+        whether `old_token` was a live member together with the cached object at `cache_key`.
+        """
+        rotated, value = await self.run_script(
+            connection=connection,
+            name="rotate_refresh_token",
+            keys=[key, cache_key],
+            args=[int(time.time()), old_token, new_token, expire_at, max_size],
+            decode_responses=False,
+        )
+        if not rotated:
+            return False, None
+        return True, None if value is None else self.codec.decode(value)
 
 
-user = RedisRepositoryUser()
+user = RedisRepositoryUser(
+    codec=StructCodec.from_schema(
+        UserInDB, version=USER_CACHE_VERSION, tz=pytz.timezone(settings.APP.TIMEZONE)
+    )
+)
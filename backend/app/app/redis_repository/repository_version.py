@@ -0,0 +1,56 @@
+from typing import Any, Sequence
+
+from redis.asyncio import Redis
+
+from app.redis_repository.base import RedisRepositoryBase
+
+TOMBSTONE = {"deleted": True}
+
+
+class RedisRepositoryVersion(RedisRepositoryBase):
+    """
+    The version (`updated_at`, owner...) of rows cached per table and id, so conditional
+    requests can be answered without reading the row. Writes overwrite the entry while reads
+    only fill a missing one, so a read racing a write can't put back an older version. Deletes
+    leave a short-lived tombstone for the same reason, instead of removing the entry.
+    """
+
+    @staticmethod
+    def _generate_redis_version(table: str, id: int) -> str:  # pylint: disable=redefined-builtin
+        return f"Version:{table}:{id}"
+
+    async def get_version(
+        self, connection: Redis, table: str, id: int  # pylint: disable=redefined-builtin
+    ) -> dict[str, Any] | None:
+        return await self.get_object(
+            connection=connection, key=self._generate_redis_version(table, id)
+        )
+
+    async def set_version(  # pylint: disable=too-many-arguments
+        self,
+        connection: Redis,
+        table: str,
+        id: int,  # pylint: disable=redefined-builtin
+        data: dict[str, Any],
+        ttl: int | None = None,
+        overwrite: bool = True,
+    ) -> None:
+        await self.create_object(
+            connection=connection,
+            key=self._generate_redis_version(table, id),
+            data=data,
+            ttl=ttl,
+            nx=not overwrite,
+        )
+
+    async def delete_versions(
+        self, connection: Redis, table: str, ids: Sequence[int], ttl: int | None = None
+    ) -> None:
+        await self.create_objects(
+            connection=connection,
+            mapping={self._generate_redis_version(table, row_id): TOMBSTONE for row_id in ids},
+            ttl=ttl,
+        )
+
+
+version = RedisRepositoryVersion()
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from datetime import datetime
+
+from pydantic import BaseModel, Field, validator
 
 from app.schemas.user import User, UserInDB, UserInDBBase
 
@@ -9,6 +11,7 @@ __all__ = [
     "ItemInDBBase",
     "Item",
     "ItemInDB",
+    "ItemBulkCreated",
 ]
 
 
@@ -25,7 +28,17 @@ class ItemCreate(ItemBase):
 
 # Properties to receive on item update
 class ItemUpdate(ItemBase):
-    pass
+    updated_at: datetime | None = Field(
+        None, description="Only update if the item wasn't modified since this `updated_at`"
+    )
+
+    @validator("updated_at")
+    def updated_at_has_timezone(  # pylint: disable=no-self-argument
+        cls, value: datetime | None
+    ) -> datetime | None:
+        if value is not None and value.tzinfo is None:
+            raise ValueError("updated_at must include a timezone")
+        return value
 
 
 # Properties shared by models stored in DB
@@ -35,6 +48,7 @@ class ItemInDBBase(ItemBase):
 
     id: int
     title: str
+    updated_at: datetime
     owner: UserInDBBase
 
 
@@ -52,3 +66,9 @@ class ItemInDB(ItemInDBBase):
         orm_mode = True
 
     owner: UserInDB
+
+
+# Properties to return to client after a bulk create
+class ItemBulkCreated(BaseModel):
+    count: int
+    items: list[Item] | None = None
@@ -8,7 +8,15 @@ DataT = TypeVar("DataT")
 ErrorT = TypeVar("ErrorT")
 
 
-__all__ = ["Error", "Status", "ErrorResponse", "SuccessfulResponse", "create_successful_response"]
+__all__ = [
+    "Error",
+    "Status",
+    "ErrorResponse",
+    "CountStrategy",
+    "Pagination",
+    "SuccessfulResponse",
+    "create_successful_response",
+]
 
 
 class Error(BaseModel, Generic[ErrorT]):
@@ -36,11 +44,31 @@ class ValidationErrorResponse(GenericModel, Generic[ErrorT]):
     data: Any | None = Field(None, example="null")
 
 
+class CountStrategy(str, Enum):
+    exact = "exact"
+    estimated = "estimated"
+    cached = "cached"
+
+
+class Pagination(BaseModel):
+    next_cursor: str | None = Field(None, description="Pass as `cursor` to get the next page")
+    total: int | None = None
+    total_strategy: CountStrategy | None = Field(
+        None, description="How `total` was computed, null when no total was requested"
+    )
+
+
 class SuccessfulResponse(GenericModel, Generic[DataT]):
     status: Status = Field(Status.success)
     data: DataT | None = None
     error: Any | None = Field(None, example="null")
+    pagination: Pagination | None = Field(None, example="null")
 
 
-def create_successful_response(data: DataT) -> SuccessfulResponse[DataT]:
-    return SuccessfulResponse(data=data, status=Status.success, error=None)
+def create_successful_response(
+    data: DataT, pagination: Pagination | None = None
+) -> SuccessfulResponse[DataT]:
+    # Not validated here, `data` is serialized against the `response_model` of the route
+    return SuccessfulResponse.construct(
+        data=data, status=Status.success, error=None, pagination=pagination
+    )
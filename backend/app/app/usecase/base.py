@@ -1,11 +1,20 @@
-from typing import Any, Generic, Sequence, Type, TypeVar
+from datetime import datetime
+from functools import partial
+from typing import Any, AsyncIterator, Awaitable, Callable, Generic, Sequence, Type, TypeVar
 
 from pydantic import BaseModel
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.base import ExecutableOption
 
+from app.core.settings import settings
 from app.db.base_class import Base
+from app.db.unit_of_work import after_commit
 from app.pg_repository.base import PgRepositoryBase
-from app.utils.encoders import jsonable_encoder_sqlalchemy
+from app.redis_repository.repository_count import count as redis_repository_count
+from app.schemas.response import CountStrategy
+from app.utils.encoders import extract_fields
+from app.utils.pagination import decode_cursor, encode_cursor
 
 ModelType = TypeVar("ModelType", bound=Base)
 PgRepositoryType = TypeVar("PgRepositoryType", bound=PgRepositoryBase)
@@ -19,25 +28,82 @@ class UseCaseBase(Generic[ModelType, PgRepositoryType, CreateSchemaType, UpdateS
         self.pg_repository = pg_repository
 
     async def get(
-        self, db: AsyncSession, id: int  # pylint: disable=redefined-builtin
+        self,
+        db: AsyncSession,
+        id: int,  # pylint: disable=redefined-builtin
+        *,
+        options: Sequence[ExecutableOption] | None = None,
     ) -> ModelType | None:
-        return await self.pg_repository.get(db=db, id=id)
+        return await self.pg_repository.get(db=db, id=id, options=options)
 
-    async def get_all(self, db: AsyncSession) -> Sequence[ModelType]:
-        return await self.pg_repository.get_all(db=db)
+    async def get_all(
+        self, db: AsyncSession, options: Sequence[ExecutableOption] | None = None
+    ) -> Sequence[ModelType]:
+        return await self.pg_repository.get_all(db=db, options=options)
+
+    def stream(
+        self,
+        db: AsyncSession,
+        batch_size: int = 1000,
+        options: Sequence[ExecutableOption] | None = None,
+    ) -> AsyncIterator[Sequence[ModelType]]:
+        return self.pg_repository.stream(db=db, batch_size=batch_size, options=options)
 
-    async def create(self, db: AsyncSession, obj_in: CreateSchemaType) -> ModelType:
-        obj_in_data = jsonable_encoder_sqlalchemy(obj_in)
+    async def create(
+        self, db: AsyncSession, obj_in: CreateSchemaType, connection: Redis | None = None
+    ) -> ModelType:
+        obj_in_data = extract_fields(obj_in)
         db_obj = self.model(**obj_in_data)  # type: ignore
-        return await self.pg_repository.create(db=db, db_obj=db_obj)
+        db_obj = await self.pg_repository.create(db=db, db_obj=db_obj)
+        if connection is not None:
+            after_commit(db, partial(self.invalidate_count, connection=connection))
+        return db_obj
 
-    async def delete(self, db: AsyncSession, db_obj: ModelType) -> ModelType:
-        return await self.pg_repository.delete(db=db, db_obj=db_obj)
+    async def create_many(
+        self,
+        db: AsyncSession,
+        objs_in: Sequence[CreateSchemaType],
+        connection: Redis | None = None,
+        options: Sequence[ExecutableOption] | None = None,
+    ) -> Sequence[ModelType]:
+        db_objs = await self.pg_repository.create_many(
+            db=db, objs_in=[obj_in.dict() for obj_in in objs_in], options=options
+        )
+        if connection is not None:
+            after_commit(db, partial(self.invalidate_count, connection=connection))
+        return db_objs
+
+    async def copy_many(
+        self,
+        db: AsyncSession,
+        objs_in: Sequence[CreateSchemaType],
+        connection: Redis | None = None,
+    ) -> int:
+        created = await self.pg_repository.copy_many(
+            db=db, objs_in=[obj_in.dict() for obj_in in objs_in]
+        )
+        if connection is not None:
+            after_commit(db, partial(self.invalidate_count, connection=connection))
+        return created
+
+    async def delete(
+        self, db: AsyncSession, db_obj: ModelType, *, connection: Redis | None = None
+    ) -> ModelType:
+        db_obj = await self.pg_repository.delete(db=db, db_obj=db_obj)
+        if connection is not None:
+            after_commit(db, partial(self.invalidate_count, connection=connection))
+        return db_obj
 
     async def delete_by_id(
-        self, db: AsyncSession, id: int  # pylint: disable=redefined-builtin
+        self,
+        db: AsyncSession,
+        id: int,  # pylint: disable=redefined-builtin
+        *,
+        connection: Redis | None = None,
     ) -> None:
         await self.pg_repository.delete_by_id(db=db, id=id)
+        if connection is not None:
+            after_commit(db, partial(self.invalidate_count, connection=connection))
 
     async def update(
         self, db: AsyncSession, db_obj: ModelType, obj_in: UpdateSchemaType | dict[str, Any]
@@ -48,7 +114,106 @@ class UseCaseBase(Generic[ModelType, PgRepositoryType, CreateSchemaType, UpdateS
             update_data=obj_in if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True),
         )
 
+    async def update_by_id(
+        self,
+        db: AsyncSession,
+        id: int,  # pylint: disable=redefined-builtin
+        obj_in: UpdateSchemaType | dict[str, Any],
+        updated_at: datetime | None = None,
+    ) -> ModelType | None:
+        return await self.pg_repository.update_by_id(
+            db=db,
+            id=id,
+            update_data=obj_in if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True),
+            updated_at=updated_at,
+        )
+
     async def get_multi(
-        self, db: AsyncSession, offset: int = 0, limit: int = 100
+        self,
+        db: AsyncSession,
+        offset: int = 0,
+        limit: int = 100,
+        options: Sequence[ExecutableOption] | None = None,
     ) -> Sequence[ModelType]:
-        return await self.pg_repository.get_multi(db=db, offset=offset, limit=limit)
+        return await self.pg_repository.get_multi(
+            db=db, offset=offset, limit=limit, options=options
+        )
+
+    async def get_page(
+        self,
+        db: AsyncSession,
+        *,
+        cursor: str | None = None,
+        offset: int = 0,
+        limit: int = 100,
+        options: Sequence[ExecutableOption] | None = None,
+    ) -> tuple[Sequence[ModelType], str | None]:
+        return await self._page(
+            order_by=("id",),
+            cursor=cursor,
+            pager=lambda after: self.pg_repository.get_page(
+                db=db, after=after, offset=offset, limit=limit, options=options
+            ),
+        )
+
+    async def _page(
+        self,
+        order_by: Sequence[str],
+        cursor: str | None,
+        pager: Callable[
+            [list[Any] | None], Awaitable[tuple[Sequence[ModelType], list[Any] | None]]
+        ],
+    ) -> tuple[Sequence[ModelType], str | None]:
+        """
+        Fetch the page following the sort key held in `cursor` with `pager`, along with the
+        cursor of the page after it, None on the last page.
+        """
+        objs, next_key = await pager(decode_cursor(cursor, order_by=order_by) if cursor else None)
+        return objs, encode_cursor(order_by, next_key) if next_key is not None else None
+
+    async def _count(
+        self,
+        connection: Redis | None,
+        strategy: CountStrategy,
+        scope: str,
+        counter: Callable[[bool], Awaitable[int]],
+    ) -> int:
+        """
+        `exact` runs COUNT(*), `estimated` reads the planner statistics and `cached` serves
+        an exact count from Redis for `CACHE.COUNT_TTL` seconds or until the next write.
+        """
+        if strategy != CountStrategy.cached or connection is None:
+            return await counter(strategy == CountStrategy.estimated)
+
+        table = self.model.__tablename__
+        total = await redis_repository_count.get_count(
+            connection=connection, table=table, scope=scope
+        )
+        if total is None:
+            total = await counter(False)
+            await redis_repository_count.set_count(
+                connection=connection,
+                table=table,
+                scope=scope,
+                value=total,
+                ttl=settings.CACHE.COUNT_TTL,
+            )
+        return total
+
+    async def count(
+        self,
+        db: AsyncSession,
+        connection: Redis | None = None,
+        strategy: CountStrategy = CountStrategy.exact,
+    ) -> int:
+        return await self._count(
+            connection=connection,
+            strategy=strategy,
+            scope="all",
+            counter=lambda estimated: self.pg_repository.count_all(db=db, estimated=estimated),
+        )
+
+    async def invalidate_count(self, connection: Redis) -> None:
+        await redis_repository_count.invalidate(
+            connection=connection, table=self.model.__tablename__
+        )
@@ -1,16 +1,91 @@
-from typing import Sequence
+from datetime import datetime
+from functools import partial
+from typing import Any, AsyncIterator, Sequence
 
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.base import ExecutableOption
 
+from app.core.settings import settings
+from app.db.unit_of_work import after_commit
 from app.models import Item
 from app.pg_repository.repository_item import item as repository_item
 from app.pg_repository.repository_item import PgRepositoryItem
+from app.redis_repository.repository_version import TOMBSTONE
+from app.redis_repository.repository_version import version as redis_repository_version
 from app.schemas.item import ItemCreate, ItemUpdate
+from app.schemas.response import CountStrategy
 from app.usecase.base import UseCaseBase
-from app.utils.encoders import jsonable_encoder_sqlalchemy
+from app.utils import errors
+from app.utils.encoders import extract_fields
 
 
 class UseCaseItem(UseCaseBase[Item, PgRepositoryItem, ItemCreate, ItemUpdate]):
+    @staticmethod
+    def _to_version_data(db_obj: Item) -> dict[str, Any]:
+        return {"owner_id": db_obj.owner_id, "updated_at": db_obj.updated_at.isoformat()}
+
+    async def get_version(
+        self, connection: Redis, id: int  # pylint: disable=redefined-builtin
+    ) -> tuple[int, datetime] | None:
+        """
+        Owner and `updated_at` of an item from the version cache, None on a miss. Raises
+        `ErrNotFound` while the item has been deleted recently.
+        """
+        data = await redis_repository_version.get_version(
+            connection=connection, table=self.model.__tablename__, id=id
+        )
+        if data is None:
+            return None
+        if data == TOMBSTONE:
+            raise errors.ErrNotFound("item not found")
+        return data["owner_id"], datetime.fromisoformat(data["updated_at"])
+
+    async def set_version(self, connection: Redis, db_obj: Item, overwrite: bool = False) -> None:
+        """
+        Cache the version of an item. Only writes may `overwrite` it, a read could have
+        loaded the item before a concurrent write or from a lagging replica.
+        """
+        await redis_repository_version.set_version(
+            connection=connection,
+            table=self.model.__tablename__,
+            id=db_obj.id,
+            data=self._to_version_data(db_obj),
+            ttl=settings.CACHE.VERSION_TTL,
+            overwrite=overwrite,
+        )
+
+    def _after_update(
+        self, db: AsyncSession, connection: Redis | None, db_obj: Item | None
+    ) -> None:
+        if connection is not None and db_obj is not None:
+            after_commit(
+                db, partial(self.set_version, connection=connection, db_obj=db_obj, overwrite=True)
+            )
+
+    def _after_delete(self, db: AsyncSession, connection: Redis | None, ids: Sequence[int]) -> None:
+        if connection is not None and ids:
+            after_commit(
+                db,
+                partial(
+                    redis_repository_version.delete_versions,
+                    connection=connection,
+                    table=self.model.__tablename__,
+                    ids=ids,
+                    ttl=settings.CACHE.VERSION_TOMBSTONE_TTL,
+                ),
+            )
+
+    async def delete_versions_by_owner(
+        self, db: AsyncSession, connection: Redis, owner_id: int
+    ) -> None:
+        """
+        Drop the cached versions of the items of an owner about to be deleted with them, once
+        the transaction commits.
+        """
+        ids = await self.pg_repository.get_ids_by_owner(db=db, owner_id=owner_id)
+        self._after_delete(db, connection=connection, ids=ids)
+
     async def get_multi_by_owner(
         self,
         db: AsyncSession,
@@ -18,17 +93,173 @@ class UseCaseItem(UseCaseBase[Item, PgRepositoryItem, ItemCreate, ItemUpdate]):
         owner_id: int,
         offset: int = 0,
         limit: int = 100,
+        options: Sequence[ExecutableOption] | None = None,
     ) -> Sequence[Item]:
         return await self.pg_repository.get_multi_by_owner(
-            db=db, owner_id=owner_id, offset=offset, limit=limit
+            db=db, owner_id=owner_id, offset=offset, limit=limit, options=options
+        )
+
+    async def get_page_by_owner(
+        self,
+        db: AsyncSession,
+        *,
+        owner_id: int,
+        cursor: str | None = None,
+        offset: int = 0,
+        limit: int = 100,
+        options: Sequence[ExecutableOption] | None = None,
+    ) -> tuple[Sequence[Item], str | None]:
+        return await self._page(
+            order_by=("id",),
+            cursor=cursor,
+            pager=lambda after: self.pg_repository.get_page_by_owner(
+                db=db, owner_id=owner_id, after=after, offset=offset, limit=limit, options=options
+            ),
+        )
+
+    def stream_by_owner(
+        self,
+        db: AsyncSession,
+        *,
+        owner_id: int,
+        batch_size: int = 1000,
+        options: Sequence[ExecutableOption] | None = None,
+    ) -> AsyncIterator[Sequence[Item]]:
+        return self.pg_repository.stream_by_owner(
+            db=db, owner_id=owner_id, batch_size=batch_size, options=options
+        )
+
+    async def search(
+        self,
+        db: AsyncSession,
+        *,
+        query: str,
+        owner_id: int | None = None,
+        cursor: str | None = None,
+        limit: int = 100,
+    ) -> tuple[Sequence[Item], str | None]:
+        return await self._page(
+            order_by=("-score", "-id"),
+            cursor=cursor,
+            pager=lambda after: self.pg_repository.search(
+                db=db, query=query, owner_id=owner_id, after=after, limit=limit
+            ),
+        )
+
+    async def count_by_owner(
+        self,
+        db: AsyncSession,
+        connection: Redis | None = None,
+        *,
+        owner_id: int,
+        strategy: CountStrategy = CountStrategy.exact,
+    ) -> int:
+        return await self._count(
+            connection=connection,
+            strategy=strategy,
+            scope=f"owner:{owner_id}",
+            counter=lambda estimated: self.pg_repository.count_by_owner(
+                db=db, owner_id=owner_id, estimated=estimated
+            ),
         )
 
     async def create_with_owner(
-        self, db: AsyncSession, *, obj_in: ItemCreate, owner_id: int
+        self,
+        db: AsyncSession,
+        connection: Redis | None = None,
+        *,
+        obj_in: ItemCreate,
+        owner_id: int,
     ) -> Item:
-        obj_in_data = jsonable_encoder_sqlalchemy(obj_in)
+        obj_in_data = extract_fields(obj_in)
         db_obj = self.model(**obj_in_data, owner_id=owner_id)  # type: ignore
-        return await self.pg_repository.create(db=db, db_obj=db_obj)
+        db_obj = await self.pg_repository.create(db=db, db_obj=db_obj)
+        if connection is not None:
+            after_commit(db, partial(self.invalidate_count, connection=connection))
+        return db_obj
+
+    async def update_by_owner(
+        self,
+        db: AsyncSession,
+        *,
+        id: int,  # pylint: disable=redefined-builtin
+        owner_id: int,
+        obj_in: ItemUpdate | dict[str, Any],
+        updated_at: datetime | None = None,
+        connection: Redis | None = None,
+    ) -> Item | None:
+        db_obj = await self.pg_repository.update_by_id(
+            db=db,
+            id=id,
+            update_data=obj_in if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True),
+            updated_at=updated_at,
+            criteria=(self.model.owner_id == owner_id,),
+        )
+        self._after_update(db, connection=connection, db_obj=db_obj)
+        return db_obj
+
+    async def update_by_id(
+        self,
+        db: AsyncSession,
+        id: int,  # pylint: disable=redefined-builtin
+        obj_in: ItemUpdate | dict[str, Any],
+        updated_at: datetime | None = None,
+        *,
+        connection: Redis | None = None,
+    ) -> Item | None:
+        db_obj = await super().update_by_id(db=db, id=id, obj_in=obj_in, updated_at=updated_at)
+        self._after_update(db, connection=connection, db_obj=db_obj)
+        return db_obj
+
+    async def delete(
+        self, db: AsyncSession, db_obj: Item, *, connection: Redis | None = None
+    ) -> Item:
+        db_obj = await super().delete(db=db, db_obj=db_obj, connection=connection)
+        self._after_delete(db, connection=connection, ids=(db_obj.id,))
+        return db_obj
+
+    async def delete_by_id(
+        self,
+        db: AsyncSession,
+        id: int,  # pylint: disable=redefined-builtin
+        *,
+        connection: Redis | None = None,
+    ) -> None:
+        await super().delete_by_id(db=db, id=id, connection=connection)
+        self._after_delete(db, connection=connection, ids=(id,))
+
+    async def create_many_with_owner(
+        self,
+        db: AsyncSession,
+        connection: Redis | None = None,
+        *,
+        objs_in: Sequence[ItemCreate],
+        owner_id: int,
+        options: Sequence[ExecutableOption] | None = None,
+    ) -> Sequence[Item]:
+        db_objs = await self.pg_repository.create_many(
+            db=db,
+            objs_in=[{**obj_in.dict(), "owner_id": owner_id} for obj_in in objs_in],
+            options=options,
+        )
+        if connection is not None:
+            after_commit(db, partial(self.invalidate_count, connection=connection))
+        return db_objs
+
+    async def copy_many_with_owner(
+        self,
+        db: AsyncSession,
+        connection: Redis | None = None,
+        *,
+        objs_in: Sequence[ItemCreate],
+        owner_id: int,
+    ) -> int:
+        created = await self.pg_repository.copy_many(
+            db=db, objs_in=[{**obj_in.dict(), "owner_id": owner_id} for obj_in in objs_in]
+        )
+        if connection is not None:
+            after_commit(db, partial(self.invalidate_count, connection=connection))
+        return created
 
 
 item = UseCaseItem(Item, repository_item)
@@ -1,13 +1,22 @@
+import asyncio
+import random
+import secrets
+import time
 from datetime import timedelta
+from functools import partial
 from typing import Any, Type
 
 from jose import exceptions, jwt
+from loguru import logger
 from pydantic import ValidationError
 from redis.asyncio import Redis
+from redis.exceptions import RedisError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import create_token, get_password_hash, verify_password
+from app.core.metrics import metrics
+from app.core.security import create_token, password_hasher, verified_token_cache
 from app.core.settings import settings
+from app.db.unit_of_work import after_commit
 from app.models.user import User
 from app.pg_repository.repository_user import PgRepositoryUser
 from app.pg_repository.repository_user import user as pg_repository_user
@@ -15,8 +24,10 @@ from app.redis_repository.repository_user import RedisRepositoryUser
 from app.redis_repository.repository_user import user as redis_repository_user
 from app.schemas.user import UserCreate, UserInDB, UserUpdate
 from app.usecase.base import UseCaseBase
+from app.usecase.usecase_item import item as usecase_item
 from app.utils import errors
-from app.utils.encoders import jsonable_encoder_sqlalchemy
+from app.utils.cache import TTLCache
+from app.utils.encoders import field_extractor
 
 
 class UseCaseUser(UseCaseBase[User, PgRepositoryUser, UserCreate, UserUpdate]):
@@ -28,31 +39,145 @@ class UseCaseUser(UseCaseBase[User, PgRepositoryUser, UserCreate, UserUpdate]):
     ) -> None:
         super().__init__(model, pg_repository)
         self.redis_repository = redis_repository
+        self.local_cache: TTLCache[int, dict[str, Any]] = TTLCache(
+            max_size=settings.CACHE.USER_LOCAL_MAX_SIZE, ttl=settings.CACHE.USER_LOCAL_TTL
+        )
+        self._inflight: dict[int, asyncio.Future[dict[str, Any] | None]] = {}
 
     @staticmethod
     def _generate_redis_user(id: int) -> str:  # pylint: disable=redefined-builtin
         return f"Cache:User:{id}"
 
+    @staticmethod
+    def _generate_redis_user_lock(id: int) -> str:  # pylint: disable=redefined-builtin
+        return f"Lock:User:{id}"
+
     @staticmethod
     def _generate_redis_refresh_token(id: int) -> str:  # pylint: disable=redefined-builtin
-        return f"RefreshToken:{id}"
+        return f"RefreshTokens:{id}"
+
+    @staticmethod
+    def _generate_cache_ttl() -> int:
+        return settings.CACHE.USER_TTL + random.randint(0, settings.CACHE.USER_TTL_JITTER)  # nosec
+
+    @staticmethod
+    def _to_cache_data(db_obj: User) -> dict[str, Any]:
+        return field_extractor(UserInDB)(db_obj)
 
-    async def create_cache(self, connection: Redis, db_obj: User) -> None:
-        user_in_db = UserInDB.from_orm(db_obj)
-        await self.redis_repository.create(
-            connection=connection, key=self._generate_redis_user(db_obj.id), value=user_in_db.json()
+    async def create_cache(self, connection: Redis, db_obj: User) -> dict[str, Any]:
+        data = self._to_cache_data(db_obj)
+        self.local_cache.set(db_obj.id, data)
+        await self.redis_repository.create_object(
+            connection=connection,
+            key=self._generate_redis_user(db_obj.id),
+            data=data,
+            ttl=self._generate_cache_ttl(),
         )
+        return data
+
+    async def get_cache_data(self, connection: Redis, obj_id: int) -> dict[str, Any] | None:
+        data = self.local_cache.get(obj_id)
+        if data is None:
+            data = await self.redis_repository.get_object(
+                connection=connection, key=self._generate_redis_user(obj_id)
+            )
+            if data is None:
+                return None
+            self.local_cache.set(obj_id, data)
+        return data
 
     async def get_cache(self, connection: Redis, obj_id: int) -> User | None:
-        db_obj = await self.redis_repository.get(
-            connection=connection, key=self._generate_redis_user(obj_id)
-        )
-        if not db_obj:
+        data = await self.get_cache_data(connection=connection, obj_id=obj_id)
+        if data is None:
             return None
-        user_in_db = UserInDB.parse_raw(db_obj)
-        obj_in_data = jsonable_encoder_sqlalchemy(user_in_db)
-        db_obj = User(**obj_in_data)  # type: ignore
-        return db_obj
+        return User(**data)
+
+    async def delete_cache(self, connection: Redis, obj_id: int, logout: bool = False) -> None:
+        self.local_cache.delete(obj_id)
+        keys = [self._generate_redis_user(obj_id)]
+        if logout:
+            keys.append(self._generate_redis_refresh_token(obj_id))
+        async with self.redis_repository.pipeline(connection=connection) as pipe:
+            await self.redis_repository.delete_many(connection=pipe, keys=keys)
+            await self.redis_repository.publish(
+                connection=pipe,
+                channel=settings.CACHE.USER_INVALIDATION_CHANNEL,
+                message=str(obj_id),
+            )
+
+    async def listen_cache_invalidation(self, connection: Redis) -> None:
+        """
+        Drop users from the local cache when any worker publishes an invalidation.
+        Runs for the whole process lifetime, the local cache is cleared whenever the
+        subscription is lost because invalidations may have been missed meanwhile.
+        """
+        while True:
+            try:
+                async for message in self.redis_repository.listen(
+                    connection=connection, channel=settings.CACHE.USER_INVALIDATION_CHANNEL
+                ):
+                    try:
+                        self.local_cache.delete(int(message))
+                    except ValueError:
+                        logger.warning("malformed user cache invalidation: {!r}", message)
+            except RedisError as e:
+                logger.warning("user cache invalidation subscription lost: {}", e)
+            except Exception:  # pylint: disable=broad-except
+                # Nothing awaits this task, an error ending it would stop invalidation silently
+                logger.exception("user cache invalidation listener failed")
+            self.local_cache.clear()
+            await asyncio.sleep(1)
+
+    async def _rebuild_cache(
+        self, db: AsyncSession, connection: Redis, id: int  # pylint: disable=redefined-builtin
+    ) -> tuple[User | None, dict[str, Any] | None]:
+        """
+        Load a user from postgres into the cache while holding a short redis lock, so that
+        concurrent misses on other workers wait for the cache instead of querying postgres.
+        """
+        lock_key = self._generate_redis_user_lock(id)
+        lock_token = secrets.token_hex(16)
+        locked = False
+        for _ in range(settings.CACHE.USER_LOCK_RETRIES):
+            locked = await self.redis_repository.acquire_lock(
+                connection=connection,
+                key=lock_key,
+                token=lock_token,
+                ttl=settings.CACHE.USER_LOCK_TTL,
+            )
+            if locked:
+                break
+            await asyncio.sleep(settings.CACHE.USER_LOCK_WAIT)
+            data = await self.get_cache_data(connection=connection, obj_id=id)
+            if data is not None:
+                return User(**data), data
+
+        try:
+            obj = await self.pg_repository.get(db=db, id=id)
+            if not obj:
+                return None, None
+            return obj, await self.create_cache(connection=connection, db_obj=obj)
+        finally:
+            if locked:
+                await self.redis_repository.release_lock(
+                    connection=connection, key=lock_key, token=lock_token
+                )
+
+    async def _wait_rebuild(
+        self,
+        db: AsyncSession,
+        connection: Redis,
+        id: int,  # pylint: disable=redefined-builtin
+        inflight: asyncio.Future[dict[str, Any] | None],
+    ) -> User | None:
+        try:
+            data = await asyncio.shield(inflight)
+        except asyncio.CancelledError:
+            if not inflight.cancelled():
+                raise
+            # The leader was cancelled rather than failing, let one of the waiters retry
+            return await self.get(db=db, connection=connection, id=id)
+        return None if data is None else User(**data)
 
     async def get(
         self, db: AsyncSession, connection: Redis, id: int  # pylint: disable=redefined-builtin
@@ -60,35 +185,50 @@ class UseCaseUser(UseCaseBase[User, PgRepositoryUser, UserCreate, UserUpdate]):
         cached_user = await self.get_cache(connection=connection, obj_id=id)
         if cached_user is not None:
             return cached_user
-        obj = await self.pg_repository.get(db=db, id=id)
-        if not obj:
-            return None
-        await self.create_cache(connection=connection, db_obj=obj)
+
+        # Coalesce concurrent misses in this process onto a single rebuild
+        inflight = self._inflight.get(id)
+        if inflight is not None:
+            return await self._wait_rebuild(db=db, connection=connection, id=id, inflight=inflight)
+
+        inflight = asyncio.get_running_loop().create_future()
+        self._inflight[id] = inflight
+        try:
+            obj, data = await self._rebuild_cache(db=db, connection=connection, id=id)
+        except Exception as e:
+            # Waiters fail fast with the same error instead of retrying one after another
+            inflight.set_exception(e)
+            # Retrieved here, the future may have no waiter to do it
+            inflight.exception()
+            raise
+        except BaseException:
+            inflight.cancel()
+            raise
+        finally:
+            del self._inflight[id]
+        inflight.set_result(data)
         return obj
 
     async def delete(self, db: AsyncSession, connection: Redis, db_obj: User) -> User:
+        await usecase_item.delete_versions_by_owner(db, connection=connection, owner_id=db_obj.id)
         obj = await self.pg_repository.delete(db=db, db_obj=db_obj)
 
-        await self.redis_repository.delete(
-            connection=connection, key=self._generate_redis_user(db_obj.id)
-        )
-
-        await self.redis_repository.delete(
-            connection=connection, key=self._generate_redis_refresh_token(db_obj.id)
+        after_commit(
+            db,
+            partial(self.delete_cache, connection=connection, obj_id=db_obj.id, logout=True),
         )
+        after_commit(db, partial(self.invalidate_count, connection=connection))
 
         return obj
 
     async def delete_by_id(
         self, db: AsyncSession, connection: Redis, id: int  # pylint: disable=redefined-builtin
     ) -> None:
+        await usecase_item.delete_versions_by_owner(db, connection=connection, owner_id=id)
         await self.pg_repository.delete_by_id(db=db, id=id)
 
-        await self.redis_repository.delete(connection=connection, key=self._generate_redis_user(id))
-
-        await self.redis_repository.delete(
-            connection=connection, key=self._generate_redis_refresh_token(id)
-        )
+        after_commit(db, partial(self.delete_cache, connection=connection, obj_id=id, logout=True))
+        after_commit(db, partial(self.invalidate_count, connection=connection))
 
     async def get_by_email(self, db: AsyncSession, *, email: str) -> User | None:
         return await self.pg_repository.get_by_email(db=db, email=email)
@@ -98,32 +238,34 @@ class UseCaseUser(UseCaseBase[User, PgRepositoryUser, UserCreate, UserUpdate]):
     ) -> tuple[User, bool]:
         return await self.pg_repository.get_or_create_by_email(db=db, email=email, **kwargs)
 
-    async def create(self, db: AsyncSession, *, obj_in: UserCreate) -> User:
+    async def create(
+        self, db: AsyncSession, connection: Redis | None = None, *, obj_in: UserCreate
+    ) -> User:
         db_obj = self.model(  # type: ignore
             email=obj_in.email,
-            hashed_password=get_password_hash(obj_in.password),
+            hashed_password=await password_hasher.hash(obj_in.password),
             full_name=obj_in.full_name,
             is_superuser=obj_in.is_superuser,
             is_active=obj_in.is_active,
         )
-        return await self.pg_repository.create(db=db, db_obj=db_obj)
+        db_obj = await self.pg_repository.create(db=db, db_obj=db_obj)
+        if connection is not None:
+            after_commit(db, partial(self.invalidate_count, connection=connection))
+        return db_obj
 
     async def update(
         self, db: AsyncSession, connection: Redis, db_obj: User, obj_in: UserUpdate | dict[str, Any]
     ) -> User:
         update_data = obj_in if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True)
         if "password" in update_data and update_data["password"]:
-            hashed_password = get_password_hash(update_data["password"])
+            hashed_password = await password_hasher.hash(update_data["password"])
             del update_data["password"]
             update_data["hashed_password"] = hashed_password
         obj = await self.pg_repository.update(db=db, db_obj=db_obj, update_data=update_data)
 
-        await self.redis_repository.delete(
-            connection=connection, key=self._generate_redis_user(db_obj.id)
-        )
-
-        await self.redis_repository.delete(
-            connection=connection, key=self._generate_redis_refresh_token(db_obj.id)
+        after_commit(
+            db,
+            partial(self.delete_cache, connection=connection, obj_id=db_obj.id, logout=True),
         )
 
         return obj
@@ -148,7 +290,7 @@ class UseCaseUser(UseCaseBase[User, PgRepositoryUser, UserCreate, UserUpdate]):
         if not obj:
             raise errors.ErrNotFound("user not found")
 
-        if not verify_password(password, obj.hashed_password):
+        if not await password_hasher.verify(password, obj.hashed_password):
             raise errors.ErrWrongPassword("wrong password")
 
         if not obj.is_active:
@@ -156,15 +298,28 @@ class UseCaseUser(UseCaseBase[User, PgRepositoryUser, UserCreate, UserUpdate]):
 
         access_token, refresh_token = self.create_token(obj.id)
 
-        await self.redis_repository.set_add(
-            connection=connection,
-            key=self._generate_redis_refresh_token(obj.id),
-            value=refresh_token,
-        )
+        await self.add_refresh_token(connection=connection, obj_id=obj.id, token=refresh_token)
 
         return access_token, refresh_token, obj
 
+    @staticmethod
+    def _generate_refresh_token_expire_at() -> int:
+        return int(time.time()) + settings.JWT.REFRESH_TOKEN_EXPIRE_DURATION * 60
+
+    async def add_refresh_token(self, connection: Redis, obj_id: int, token: str) -> None:
+        await self.redis_repository.expiring_set_add(
+            connection=connection,
+            key=self._generate_redis_refresh_token(obj_id),
+            value=token,
+            expire_at=self._generate_refresh_token_expire_at(),
+            max_size=settings.JWT.REFRESH_TOKEN_MAX_SESSIONS,
+        )
+
     def parse_id_from_token(self, token: str, secret_key: str) -> int:
+        cached_id = verified_token_cache.get(token=token, secret_key=secret_key)
+        if cached_id is not None:
+            return cached_id
+
         try:
             token_data = jwt.decode(token, secret_key, algorithms=[settings.JWT.ALGORITHM])
         except (exceptions.JWTError, ValidationError) as e:
@@ -173,7 +328,11 @@ class UseCaseUser(UseCaseBase[User, PgRepositoryUser, UserCreate, UserUpdate]):
         if "sub" not in token_data and token_data["sub"] is None:
             raise errors.ErrInvalidJWTToken("could not validate credentials")
 
-        return int(token_data["sub"])
+        obj_id = int(token_data["sub"])
+        verified_token_cache.set(
+            token=token, secret_key=secret_key, sub=obj_id, exp=token_data["exp"]
+        )
+        return obj_id
 
     async def refresh_token(
         self, db: AsyncSession, connection: Redis, *, refresh_token: str
@@ -182,42 +341,50 @@ class UseCaseUser(UseCaseBase[User, PgRepositoryUser, UserCreate, UserUpdate]):
             token=refresh_token, secret_key=settings.JWT.REFRESH_TOKEN_SECRET_KEY
         )
 
-        if not await self.redis_repository.set_is_member(
-            connection=connection,
-            key=self._generate_redis_refresh_token(obj_id),
-            value=refresh_token,
-        ):
-            raise errors.ErrNotFoundRefreshTokenRedis("not found refresh token")
+        access_token, new_refresh_token = self.create_token(obj_id)
 
-        await self.redis_repository.set_delete(
+        rotated, data = await self.redis_repository.rotate_refresh_token(
             connection=connection,
             key=self._generate_redis_refresh_token(obj_id),
-            value=refresh_token,
+            cache_key=self._generate_redis_user(obj_id),
+            old_token=refresh_token,
+            new_token=new_refresh_token,
+            expire_at=self._generate_refresh_token_expire_at(),
+            max_size=settings.JWT.REFRESH_TOKEN_MAX_SESSIONS,
+        )
+        if not rotated:
+            raise errors.ErrNotFoundRefreshTokenRedis("not found refresh token")
+        verified_token_cache.revoke(
+            token=refresh_token, secret_key=settings.JWT.REFRESH_TOKEN_SECRET_KEY
         )
 
-        obj = await self.get(db=db, connection=connection, id=obj_id)
+        obj = (
+            User(**data)
+            if data is not None
+            else await self.get(db=db, connection=connection, id=obj_id)
+        )
         if obj is None:
+            await self.redis_repository.expiring_set_delete(
+                connection=connection,
+                key=self._generate_redis_refresh_token(obj_id),
+                value=new_refresh_token,
+            )
             raise errors.ErrNotFound("not found user")
 
-        access_token, refresh_token = self.create_token(obj.id)
-
-        await self.redis_repository.set_add(
-            connection=connection,
-            key=self._generate_redis_refresh_token(obj.id),
-            value=refresh_token,
-        )
-
-        return access_token, refresh_token, obj
+        return access_token, new_refresh_token, obj
 
     async def logout(self, connection: Redis, refresh_token: str) -> None:
         obj_id = self.parse_id_from_token(
             token=refresh_token, secret_key=settings.JWT.REFRESH_TOKEN_SECRET_KEY
         )
-        await self.redis_repository.set_delete(
+        await self.redis_repository.expiring_set_delete(
             connection=connection,
             key=self._generate_redis_refresh_token(obj_id),
             value=refresh_token,
         )
+        verified_token_cache.revoke(
+            token=refresh_token, secret_key=settings.JWT.REFRESH_TOKEN_SECRET_KEY
+        )
 
     async def logout_all(self, connection: Redis, obj_id: int) -> None:
         await self.redis_repository.delete(
@@ -234,3 +401,4 @@ class UseCaseUser(UseCaseBase[User, PgRepositoryUser, UserCreate, UserUpdate]):
 
 
 user = UseCaseUser(User, pg_repository_user, redis_repository_user)
+metrics.register("user_local_cache", user.local_cache.stats)
@@ -0,0 +1,66 @@
+import time
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, TypeVar
+
+__all__ = ["TTLCache"]
+
+KeyT = TypeVar("KeyT", bound=Hashable)
+ValueT = TypeVar("ValueT")
+
+
+class TTLCache(Generic[KeyT, ValueT]):
+    """
+    Bounded in-process LRU cache whose entries expire at an absolute unix timestamp.
+    **Parameters**
+    * `max_size`: Maximum number of entries, least recently used entries are evicted first
+    * `ttl`: Maximum lifetime in seconds of an entry
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[KeyT, tuple[ValueT, float]] = OrderedDict()
+
+    def get(self, key: KeyT) -> ValueT | None:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: KeyT, value: ValueT, expires_at: float | None = None) -> None:
+        max_expires_at = time.time() + self.ttl
+        expires_at = max_expires_at if expires_at is None else min(expires_at, max_expires_at)
+
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: KeyT) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
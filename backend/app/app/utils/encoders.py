@@ -1,45 +1,148 @@
-import datetime
-import decimal
-import uuid
-from typing import Any, Callable
-
-from fastapi.encoders import DictIntStrAny, jsonable_encoder, SetIntStr
-
-
-def jsonable_encoder_sqlalchemy(  # pylint: disable=too-many-arguments
-    obj: Any,
-    include: SetIntStr | DictIntStrAny | None = None,
-    exclude: SetIntStr | DictIntStrAny | None = None,
-    by_alias: bool = True,
-    exclude_unset: bool = False,
-    exclude_defaults: bool = False,
-    exclude_none: bool = False,
-    custom_encoder: dict[Any, Callable[[Any], Any]] | None = None,
-    sqlalchemy_safe: bool = True,
-) -> Any:
-    sqlalchemy_custom_encoder = {
-        bool: lambda x: x,
-        bytes: lambda x: x,
-        datetime.date: lambda x: x,
-        datetime.datetime: lambda x: x,
-        datetime.time: lambda x: x,
-        datetime.timedelta: lambda x: x,
-        decimal.Decimal: lambda x: x,
-        float: lambda x: x,
-        int: lambda x: x,
-        str: lambda x: x,
-        uuid.UUID: lambda x: x,
-    }
-    if custom_encoder is not None:
-        sqlalchemy_custom_encoder = {**sqlalchemy_custom_encoder, **custom_encoder}
-    return jsonable_encoder(
-        obj=obj,
-        include=include,
-        exclude=exclude,
-        by_alias=by_alias,
-        exclude_unset=exclude_unset,
-        exclude_defaults=exclude_defaults,
-        exclude_none=exclude_none,
-        custom_encoder=sqlalchemy_custom_encoder,
-        sqlalchemy_safe=sqlalchemy_safe,
+from operator import attrgetter
+from typing import Any, Callable, cast, Mapping
+
+from pydantic import BaseModel
+from pydantic.fields import (
+    ModelField,
+    SHAPE_COUNTER,
+    SHAPE_DEFAULTDICT,
+    SHAPE_DEQUE,
+    SHAPE_DICT,
+    SHAPE_FROZENSET,
+    SHAPE_LIST,
+    SHAPE_MAPPING,
+    SHAPE_SEQUENCE,
+    SHAPE_SET,
+    SHAPE_SINGLETON,
+    SHAPE_TUPLE_ELLIPSIS,
+)
+from pydantic.utils import lenient_issubclass
+from sqlalchemy import inspect
+from sqlalchemy.orm import Mapper
+
+_SEQUENCE_SHAPES = {
+    SHAPE_LIST,
+    SHAPE_SET,
+    SHAPE_FROZENSET,
+    SHAPE_SEQUENCE,
+    SHAPE_TUPLE_ELLIPSIS,
+    SHAPE_DEQUE,
+}
+_MAPPING_SHAPES = {SHAPE_DICT, SHAPE_MAPPING, SHAPE_DEFAULTDICT, SHAPE_COUNTER}
+
+Extractor = Callable[[Any], dict[str, Any]]
+Serializer = Callable[[Any], Any]
+
+_extractors: dict[type, Extractor] = {}
+_model_serializers: dict[type[BaseModel], Serializer] = {}
+
+
+def _compile_extractor(cls: type) -> Extractor:
+    if lenient_issubclass(cls, BaseModel):
+        fields = tuple(cast(type[BaseModel], cls).__fields__)
+        getter = attrgetter(*fields)
+        if len(fields) == 1:
+            return lambda obj: {fields[0]: getter(obj)}
+        return lambda obj: dict(zip(fields, getter(obj), strict=True))
+
+    mapper = inspect(cls, raiseerr=False)
+    if not isinstance(mapper, Mapper):
+        raise TypeError(f"no field extractor for {cls.__name__}")
+    keys = tuple(attr.key for attr in mapper.column_attrs if not attr.deferred)
+
+    def extract_columns(obj: Any) -> dict[str, Any]:
+        # Only loaded columns, reading an expired one would emit a query
+        state = obj.__dict__
+        return {key: state[key] for key in keys if key in state}
+
+    return extract_columns
+
+
+def field_extractor(cls: type) -> Extractor:
+    """
+    Get the function turning an instance of `cls` into a dict of its fields, compiled once
+    per class: the fields of a pydantic schema, read from any object having them, or the
+    loaded, non deferred columns of a SQLAlchemy model. Values are returned as they are.
+    **Parameters**
+    * `cls`: Pydantic schema or SQLAlchemy model
+    """
+    extractor = _extractors.get(cls)
+    if extractor is None:
+        extractor = _extractors[cls] = _compile_extractor(cls)
+    return extractor
+
+
+def extract_fields(obj: Any) -> dict[str, Any]:
+    return field_extractor(type(obj))(obj)
+
+
+def _passthrough(value: Any) -> Any:
+    return value
+
+
+def _compile_model(model: type[BaseModel]) -> Serializer:
+    serializer = _model_serializers.get(model)
+    if serializer is not None:
+        return serializer
+
+    fields: list[tuple[str, str, Any, Serializer]] = []
+
+    def serialize_model(value: Any) -> Any:
+        if value is None:
+            return None
+        if isinstance(value, Mapping):
+            return {
+                alias: serialize(value.get(alias, default))
+                for _, alias, default, serialize in fields
+            }
+        return {
+            alias: serialize(getattr(value, name, default))
+            for name, alias, default, serialize in fields
+        }
+
+    # Registered before its fields are compiled so self-referencing models terminate
+    _model_serializers[model] = serialize_model
+    fields.extend(
+        (field.name, field.alias, field.default, compile_serializer(field))
+        for field in model.__fields__.values()
     )
+    return serialize_model
+
+
+def compile_serializer(field: ModelField) -> Serializer:
+    """
+    Compile a function that turns a value of the type of `field`, ORM objects included, into
+    the data FastAPI would get by validating it against `field` and running it through
+    `jsonable_encoder`, without the validation: attributes are read once per field and
+    scalars (datetimes, enums, UUIDs...) are left to the JSON encoder.
+    **Parameters**
+    * `field`: Field of the type to serialize, e.g. the `response_field` of a route
+    """
+    if field.shape in _SEQUENCE_SHAPES and field.sub_fields:
+        serialize_item = compile_serializer(field.sub_fields[0])
+
+        def serialize_sequence(value: Any) -> Any:
+            return None if value is None else [serialize_item(item) for item in value]
+
+        return serialize_sequence
+
+    if field.shape in _MAPPING_SHAPES and field.sub_fields:
+        serialize_value = compile_serializer(field.sub_fields[0])
+
+        def serialize_mapping(value: Any) -> Any:
+            if value is None:
+                return None
+            return {key: serialize_value(item) for key, item in value.items()}
+
+        return serialize_mapping
+
+    if (
+        field.shape == SHAPE_SINGLETON
+        and not field.sub_fields
+        and lenient_issubclass(field.type_, BaseModel)
+        and not field.type_.__custom_root_type__
+    ):
+        return _compile_model(field.type_)
+
+    # Scalars, unions and `Any` are encoded as they are
+    return _passthrough
@@ -30,6 +30,16 @@ class ErrInternalServerError(ErrException):
         super().__init__(status_code=500, status_text="internal_server_error", msg=msg)
 
 
+class ErrServiceUnavailable(ErrException):
+    def __init__(self, msg: str):
+        super().__init__(status_code=503, status_text="service_unavailable", msg=msg)
+
+
+class ErrConflict(ErrException):
+    def __init__(self, msg: str):
+        super().__init__(status_code=409, status_text="conflict", msg=msg)
+
+
 class ErrRequestTimeoutError(ErrException):
     def __init__(self, msg: str):
         super().__init__(status_code=408, status_text="request_timeout", msg=msg)
@@ -0,0 +1,57 @@
+import csv
+import datetime
+import io
+import json
+from enum import Enum
+from typing import Any, AsyncIterator, Sequence
+
+__all__ = ["ExportFormat", "export_rows"]
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+    @property
+    def media_type(self) -> str:
+        return "application/x-ndjson" if self == ExportFormat.ndjson else "text/csv"
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+async def export_rows(
+    batches: AsyncIterator[Sequence[Any]], fields: Sequence[str], export_format: ExportFormat
+) -> AsyncIterator[str]:
+    """
+    Encode the `fields` of objects arriving in batches as NDJSON lines or CSV rows,
+    one chunk per batch so memory only depends on the batch size.
+    """
+    if export_format == ExportFormat.csv:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        async for batch in batches:
+            writer.writerows(
+                [
+                    "" if value is None else _default(value)
+                    for value in (getattr(obj, field) for field in fields)
+                ]
+                for obj in batch
+            )
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        # Only the header is left when there were no rows
+        if buffer.tell():
+            yield buffer.getvalue()
+        return
+
+    async for batch in batches:
+        yield "".join(
+            json.dumps({field: getattr(obj, field) for field in fields}, default=_default) + "\n"
+            for obj in batch
+        )
@@ -0,0 +1,77 @@
+import base64
+import hashlib
+import hmac
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Sequence
+from uuid import UUID
+
+from app.core.settings import settings
+from app.utils import errors
+
+__all__ = ["encode_cursor", "decode_cursor"]
+
+
+# Sort key types JSON can't hold, stored as `{"$t": tag, "v": text}`. datetime is a subclass
+# of date so it has to be checked first.
+_TAGGED_TYPES: tuple[tuple[str, type, Callable[[Any], str], Callable[[str], Any]], ...] = (
+    ("datetime", datetime, datetime.isoformat, datetime.fromisoformat),
+    ("date", date, date.isoformat, date.fromisoformat),
+    ("decimal", Decimal, str, Decimal),
+    ("uuid", UUID, str, UUID),
+)
+_DECODERS = {tag: decode for tag, _, _, decode in _TAGGED_TYPES}
+
+
+def _encode_value(value: Any) -> dict[str, str]:
+    for tag, value_type, encode, _ in _TAGGED_TYPES:
+        if isinstance(value, value_type):
+            return {"$t": tag, "v": encode(value)}
+    raise TypeError(f"can not use a {type(value).__name__} sort key in a cursor")
+
+
+def _decode_value(obj: dict[str, Any]) -> Any:
+    if "$t" in obj:
+        return _DECODERS[obj["$t"]](obj["v"])
+    return obj
+
+
+def _b64encode(value: bytes) -> str:
+    return base64.urlsafe_b64encode(value).rstrip(b"=").decode()
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _sign(payload: bytes) -> bytes:
+    return hmac.new(settings.APP.SECRET_KEY.encode(), payload, hashlib.sha256).digest()[:16]
+
+
+def encode_cursor(order_by: Sequence[str], values: Sequence[Any]) -> str:
+    """
+    Opaque, signed keyset cursor holding the sort key `values` of the last row of a page.
+    Datetimes, dates, decimals and UUIDs are tagged so they decode to the same type.
+    """
+    payload = json.dumps(
+        {"o": list(order_by), "v": list(values)}, separators=(",", ":"), default=_encode_value
+    ).encode()
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+
+def decode_cursor(cursor: str, order_by: Sequence[str]) -> list[Any]:
+    try:
+        encoded_payload, encoded_signature = cursor.split(".")
+        payload = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+    except ValueError as e:
+        raise errors.ErrBadRequest("invalid cursor") from e
+
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise errors.ErrBadRequest("invalid cursor")
+
+    data = json.loads(payload, object_hook=_decode_value)
+    if data["o"] != list(order_by):
+        raise errors.ErrBadRequest("cursor does not match the requested ordering")
+    return data["v"]
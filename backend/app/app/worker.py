@@ -1,15 +1,19 @@
 import logging
 from pathlib import Path
 
-import sentry_sdk
 from celery.signals import setup_logging
-from sentry_sdk.integrations.celery import CeleryIntegration
 
 from app.core.celery_app import celery_app
 from app.core.settings import settings
 from app.custom_logging import CustomizeLogger
 
 if settings.SENTRY.DSN is not None:
+    # Sentry is only imported when it is configured
+    import sentry_sdk  # pylint: disable=import-outside-toplevel
+    from sentry_sdk.integrations.celery import (  # pylint: disable=import-outside-toplevel
+        CeleryIntegration,
+    )
+
     sentry_sdk.init(
         settings.SENTRY.DSN,
         environment=settings.SENTRY.ENVIRONMENT,